@@ -0,0 +1,181 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.config.config import (
+    GENERATE_MAX_CONCURRENT, GENERATE_MAX_QUEUE, GENERATE_MAX_QUEUE_WAIT,
+    SESSION_RATE_PER_MINUTE, SESSION_BURST, SESSION_BUCKETS_MAX
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being queued"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, otherwise the seconds until one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class AdmissionController:
+    """
+    Admission control for an expensive endpoint.
+
+    At most `max_concurrent` requests run at once and at most `max_queue` wait for a
+    slot. A request is rejected straight away (instead of timing out later) when:
+    - its key (session) has used up its token bucket              -> 429
+    - the wait queue is full                                      -> 503
+    - the estimated wait, from the average service time, is above `max_wait` -> 503
+    Requests that still have not been admitted after `max_wait` seconds get a 503 too.
+
+    A batch endpoint is charged once with charge() and holds one slot() per upstream
+    call, so its calls share the concurrency limit without using up the session's rate.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = GENERATE_MAX_CONCURRENT,
+        max_queue: int = GENERATE_MAX_QUEUE,
+        max_wait: float = GENERATE_MAX_QUEUE_WAIT,
+        rate_per_minute: float = SESSION_RATE_PER_MINUTE,
+        burst: int = SESSION_BURST,
+        max_buckets: int = SESSION_BUCKETS_MAX,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.in_flight = 0
+        self.queued = 0
+        self.avg_service_time = 1.0  # seconds, exponentially weighted
+        self.counters = {
+            "admitted": 0,
+            "rejected_rate_limited": 0,
+            "rejected_queue_full": 0,
+            "rejected_wait_estimate": 0,
+            "rejected_wait_timeout": 0,
+        }
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's running event loop, not the import-time one
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    def estimated_wait(self) -> float:
+        """Seconds a newly queued request is expected to wait for a slot"""
+        if self.in_flight < self.max_concurrent and not self.queued:
+            return 0.0
+        return (self.queued + 1) * self.avg_service_time / self.max_concurrent
+
+    def _reject(self, counter: str, status_code: int, detail: str, retry_after: float):
+        self.counters[counter] += 1
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    def charge(self, key: Optional[str]) -> TokenBucket:
+        """Take one request's token from the key's bucket, or raise AdmissionRejected (429)"""
+        bucket = self._bucket(key or "anonymous")
+        wait = bucket.take()
+        if wait > 0:
+            self._reject("rejected_rate_limited", 429, "Too many requests for this session", wait)
+        return bucket
+
+    @asynccontextmanager
+    async def admit(self, key: Optional[str]) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block, or raise AdmissionRejected"""
+        async with self.slot(self.charge(key)):
+            yield
+
+    @asynccontextmanager
+    async def slot(self, bucket: Optional[TokenBucket] = None) -> AsyncIterator[None]:
+        """
+        Hold one of the `max_concurrent` slots for the block, queueing for it within the
+        limits above. `bucket` gets back the token it was charged when the request is shed.
+        """
+        if self.in_flight >= self.max_concurrent or self.queued:
+            if self.queued >= self.max_queue:
+                if bucket is not None:
+                    bucket.refund()
+                self._reject("rejected_queue_full", 503, "Server is busy, queue is full", self.estimated_wait())
+            estimate = self.estimated_wait()
+            if estimate > self.max_wait:
+                if bucket is not None:
+                    bucket.refund()
+                self._reject("rejected_wait_estimate", 503, "Server is busy, estimated wait too long", estimate)
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if bucket is not None:
+                bucket.refund()
+            self._reject("rejected_wait_timeout", 503, "Server is busy, timed out waiting in queue",
+                         self.estimated_wait())
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * (time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_service_time_ms": round(self.avg_service_time * 1000, 1),
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 1),
+            "tracked_sessions": len(self.buckets),
+            **self.counters,
+        }
@@ -0,0 +1,56 @@
+"""Shared helpers for the bulk item and user endpoints"""
+from contextlib import contextmanager
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+from app.config.config import BULK_MAX_ROWS
+from app.schemas import BulkRowResult, BulkResponse
+
+def check_bulk_size(rows: list) -> None:
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Bulk requests are limited to {BULK_MAX_ROWS} rows")
+
+def bulk_response(results: List[BulkRowResult]) -> BulkResponse:
+    failed = sum(1 for result in results if result.status == "failed")
+    return BulkResponse(total=len(results), succeeded=len(results) - failed, failed=failed, results=results)
+
+def bulk_id_results(
+    ids: List[int],
+    existing: Set[int],
+    name: str,
+    status: str,
+    check: Optional[Callable[[int], Optional[str]]] = None
+) -> Tuple[List[BulkRowResult], List[int]]:
+    """
+    Per-row results for a bulk update or delete by id. Unknown ids and ids already listed
+    earlier in the request fail; `check(index)` may fail the remaining rows, in order.
+    Returns the results and the indexes of the rows to apply.
+    """
+    results: List[BulkRowResult] = []
+    accepted = []
+    seen = set()
+    for index, row_id in enumerate(ids):
+        if row_id not in existing:
+            error = f"{name} not found"
+        elif row_id in seen:
+            error = f"{name} is listed more than once"
+        else:
+            error = check(index) if check else None
+        if error:
+            results.append(BulkRowResult(index=index, status="failed", id=row_id, error=error))
+            continue
+        seen.add(row_id)
+        accepted.append(index)
+        results.append(BulkRowResult(index=index, status=status, id=row_id))
+    return results, accepted
+
+@contextmanager
+def bulk_transaction(db: Session) -> Iterator[None]:
+    """Commit the writes of the block together; a constraint violation rolls all of them back"""
+    try:
+        yield
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Conflicting change, nothing was applied: {e.orig}")
@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from app.models import get_db
-from app.schemas import Item, ItemCreate, ItemUpdate
-from app.crud import get_items, get_item, create_item, update_item, delete_item
+from app.models import get_db, Item as ItemModel
+from app.schemas import (
+    Item, ItemCreate, ItemUpdate, ItemBulkUpdate, BulkDeleteRequest, BulkRowResult, BulkResponse
+)
+from app.api.bulk import check_bulk_size, bulk_id_results, bulk_response, bulk_transaction
+from app.crud import (
+    get_items, get_item, create_item, update_item, delete_item,
+    get_existing_ids, bulk_insert_rows, bulk_update_rows, bulk_delete_rows
+)
 
 router = APIRouter()
 
@@ -16,6 +22,40 @@ def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     items = get_items(db, skip=skip, limit=limit)
     return items
 
+@router.post("/items/bulk", response_model=BulkResponse)
+def create_items_bulk(items: List[ItemCreate], db: Session = Depends(get_db)):
+    """Create many items with one bulk insert in a single transaction"""
+    check_bulk_size(items)
+    with bulk_transaction(db):
+        ids = bulk_insert_rows(db, ItemModel, [item.dict() for item in items])
+    return bulk_response([
+        BulkRowResult(index=index, status="created", id=item_id) for index, item_id in enumerate(ids)
+    ])
+
+@router.put("/items/bulk", response_model=BulkResponse)
+def update_items_bulk(items: List[ItemBulkUpdate], db: Session = Depends(get_db)):
+    """
+    Update many items in a single transaction. Only the fields sent for a row are changed;
+    unknown or repeated ids are reported per row and the other rows are still applied.
+    """
+    check_bulk_size(items)
+    ids = [item.id for item in items]
+    results, accepted = bulk_id_results(ids, get_existing_ids(db, ItemModel, ids), "Item", "updated")
+    updates = [(items[index].id, items[index].dict(exclude_unset=True, exclude={"id"})) for index in accepted]
+    with bulk_transaction(db):
+        bulk_update_rows(db, ItemModel, updates)
+    return bulk_response(results)
+
+@router.post("/items/bulk-delete", response_model=BulkResponse)
+def delete_items_bulk(request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    """Delete many items with one DELETE ... WHERE id IN (...)"""
+    check_bulk_size(request.ids)
+    existing = get_existing_ids(db, ItemModel, request.ids)
+    results, accepted = bulk_id_results(request.ids, existing, "Item", "deleted")
+    with bulk_transaction(db):
+        bulk_delete_rows(db, ItemModel, [request.ids[index] for index in accepted])
+    return bulk_response(results)
+
 @router.get("/items/{item_id}", response_model=Item)
 def read_item(item_id: int, db: Session = Depends(get_db)):
     db_item = get_item(db, item_id=item_id)
@@ -1,26 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Iterable, List, Optional, Dict, Tuple
+import asyncio
+import itertools
+import json
+import math
 import uuid
+import zlib
 import httpx
 from datetime import datetime
 
-from app.models import get_db
+from app.config.config import (
+    N8N_WEBHOOK_URL, N8N_BATCH_MAX_ITEMS, N8N_BATCH_CONCURRENCY, N8N_BATCH_MAX_CONCURRENCY, BATCH_INGEST_SIZE,
+    MINDMAP_CACHE_MAX_BYTES, EVENTS_KEEPALIVE_SECONDS, LAYOUT_CACHE_MAX_BYTES,
+    LAYOUT_LEVEL_GAP, LAYOUT_SIBLING_GAP, LAYOUT_RADIUS_STEP
+)
+from app.models import get_db, SessionLocal
 from app.schemas import (
-    N8NMindMapResponse, MindMapResponse, GenerateMindMapRequest,
-    MindMapSummaryResponse, BusinessSessionResponse
+    MindMapResponse, GenerateMindMapRequest,
+    MindMapSummaryResponse, BusinessSessionResponse,
+    BatchGenerateMindMapRequest, BatchGenerateMindMapResponse, BatchGenerateItemResult,
+    DeleteMindMapsRequest, DeleteMindMapsResponse, SessionStatsPage
 )
 from app.crud import (
-    create_mindmap_from_n8n_response, get_mindmap, get_mindmaps_by_session,
-    get_recent_mindmaps, get_or_create_session, increment_session_queries,
-    get_session_stats, get_mindmap_analytics
+    create_mindmap_from_payload, create_mindmaps_from_payloads, get_mindmap,
+    get_mindmaps_by_session, get_recent_mindmaps, get_or_create_session,
+    get_or_create_sessions, increment_session_queries, add_session_queries,
+    get_session_stats, get_sessions_stats, SESSION_STATS_SORT_KEYS, get_mindmap_analytics,
+    get_mindmap_sessions, get_node_counts, get_layout_rows, delete_mindmaps, delete_session_mindmaps,
+    session_exists, load_mindmap_tree
 )
+from app.n8n_payload import N8NPayloadError, ParsedMindMap
+from app.n8n_client import N8NCallPolicy, N8NStatusError, CircuitOpenError
+from app.admission import AdmissionController, AdmissionRejected
+from app.cache import CacheEntry, ResponseCache, cached_json_response
+from app.export import iter_mindmap_records, iter_session_records, iter_ndjson
+from app.bulk_import import MindMapImporter, NDJSONLineReader
+from app.retention import RetentionRunner
+from app.events import EventBroker, SubscriberLimitReached, format_sse
+from app.layout import LAYOUT_TYPES, render_layout
+from app.offload import offloader, loop_lag
 
 router = APIRouter()
 
-# N8N API Configuration
-N8N_WEBHOOK_URL = "http://localhost:5678/webhook-test/mindmap"
-REQUEST_TIMEOUT = 30  # seconds
+# Shared n8n call policy: retry/hedging statistics and breaker state live for the whole process
+n8n_policy = N8NCallPolicy()
+
+# Bounded queue and per-session token buckets in front of /generate
+generate_admission = AdmissionController()
+
+# Serialized MindMapResponse bodies by mind map id. Stored maps only change through
+# delete paths (endpoints and retention), which must call publish_deleted().
+mindmap_cache = ResponseCache(MINDMAP_CACHE_MAX_BYTES)
+
+# Computed node layouts keyed by (mind map id, layout, parameters...); invalidated with mindmap_cache
+layout_cache = ResponseCache(LAYOUT_CACHE_MAX_BYTES, group=lambda key: key[0])
+
+def invalidate_mindmap_caches(mindmap_ids: Iterable[int]) -> None:
+    mindmap_ids = set(mindmap_ids)
+    mindmap_cache.invalidate_groups(mindmap_ids)
+    layout_cache.invalidate_groups(mindmap_ids)
+
+# Per-session push of mind map changes to /session/{session_id}/events subscribers
+event_broker = EventBroker()
+
+def mindmap_summary(mindmap, node_count: int) -> MindMapSummaryResponse:
+    return MindMapSummaryResponse(
+        id=mindmap.id,
+        idea=mindmap.idea,
+        created_at=mindmap.created_at,
+        node_count=node_count,
+        session_id=mindmap.session_id
+    )
+
+def publish_created(summary: MindMapSummaryResponse) -> None:
+    if event_broker.has_subscribers(summary.session_id):
+        event_broker.publish(summary.session_id, {"type": "mindmap.created", **json.loads(summary.json())})
+
+def publish_imported(created: List[Dict[str, Any]]) -> None:
+    for summary in created:
+        if event_broker.has_subscribers(summary["session_id"]):
+            publish_created(MindMapSummaryResponse(**summary))
+
+def publish_deleted(deleted: Dict[int, Optional[str]]) -> None:
+    """Drop deleted maps from the response caches and tell their session's subscribers"""
+    invalidate_mindmap_caches(deleted)
+    for mindmap_id, session_id in deleted.items():
+        event_broker.publish(session_id, {"type": "mindmap.deleted", "id": mindmap_id, "session_id": session_id})
+
+# Retention policy; the periodic task is started from app startup when RETENTION_ENABLED is set
+retention = RetentionRunner(SessionLocal, on_deleted=publish_deleted)
+
+def store_generated(db: Session, payload: ParsedMindMap, session_id: str) -> Tuple[MindMapSummaryResponse, CacheEntry]:
+    """Store a generated map and serialize it once, warming mindmap_cache for the viewer's first GET"""
+    generation = mindmap_cache.generation()
+    db_mindmap = create_mindmap_from_payload(db, payload, session_id)
+    increment_session_queries(db, session_id)
+    load_mindmap_tree(db, db_mindmap)
+    entry = mindmap_cache.put(db_mindmap.id, MindMapResponse.from_orm(db_mindmap).json().encode(), generation)
+    return mindmap_summary(db_mindmap, len(payload.rows)), entry
+
+def load_mindmap_entry(db: Session, mindmap_id: int, generation: int) -> Optional[CacheEntry]:
+    """Serialize a stored map into mindmap_cache, unless it was deleted after `generation` was taken"""
+    mindmap = get_mindmap(db, mindmap_id)
+    if not mindmap:
+        return None
+    load_mindmap_tree(db, mindmap)
+    return mindmap_cache.put(mindmap_id, MindMapResponse.from_orm(mindmap).json().encode(), generation)
+
+def n8n_error_to_http(error: Exception) -> HTTPException:
+    """Map a failure while generating a mind map to the HTTP error returned to the client"""
+    if isinstance(error, AdmissionRejected):
+        return HTTPException(
+            status_code=error.status_code,
+            detail=error.detail,
+            headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+        )
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="N8N API is currently unavailable. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+        )
+    if isinstance(error, N8NStatusError):
+        return HTTPException(
+            status_code=500,
+            detail=f"N8N API error: {error.status_code} - {error.text}"
+        )
+    if isinstance(error, N8NPayloadError):
+        return HTTPException(
+            status_code=500,
+            detail=f"Invalid response from N8N API: {str(error)}"
+        )
+    if isinstance(error, httpx.TimeoutException):
+        return HTTPException(
+            status_code=408,
+            detail="Request to N8N API timed out. Please try again."
+        )
+    if isinstance(error, httpx.RequestError):
+        return HTTPException(
+            status_code=503,
+            detail=f"Failed to connect to N8N API: {str(error)}",
+            headers={"Retry-After": str(max(1, math.ceil(n8n_policy.breaker.retry_after())))}
+        )
+    return HTTPException(
+        status_code=500,
+        detail=f"Internal server error: {str(error)}"
+    )
 
 @router.post("/generate", response_model=MindMapResponse)
 async def generate_mindmap(
@@ -29,79 +157,339 @@ async def generate_mindmap(
     db: Session = Depends(get_db)
 ):
     """
-    Generate a mind map by calling the n8n API and store the result
+    Generate a mind map by calling the n8n API and store the result.
+
+    Requests are admitted by generate_admission first: over the per-session rate or
+    when the wait queue is full they are rejected at once with 429/503 and Retry-After.
     """
+    # Generate or use provided session ID
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    # Get client info
+    client_ip = http_request.client.host if http_request.client else None
+    user_agent = http_request.headers.get("user-agent")
+    
     try:
-        # Generate or use provided session ID
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        # Get client info
-        client_ip = http_request.client.host if http_request.client else None
-        user_agent = http_request.headers.get("user-agent")
-        
-        # Get or create session
-        session = get_or_create_session(db, session_id, client_ip, user_agent)
-        
-        # Call n8n API
-        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-            n8n_response = await client.post(
-                N8N_WEBHOOK_URL,
-                json={"idea": request.idea},
-                headers={"Content-Type": "application/json"}
-            )
+        # Rate limit per session; requests without one are limited per client address
+        async with generate_admission.admit(request.session_id or client_ip):
+            # Get or create session
+            session = get_or_create_session(db, session_id, client_ip, user_agent)
             
-            if n8n_response.status_code != 200:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"N8N API error: {n8n_response.status_code} - {n8n_response.text}"
-                )
+            # Call n8n API (retries, hedging and circuit breaker are handled by the policy)
+            payload = await n8n_policy.call(request.idea)
             
-            # Parse n8n response
-            n8n_data = n8n_response.json()
+            # Store in database; tree building and serialization grow with the map, so
+            # large maps are handled in the offload pool to keep the event loop responsive
+            summary, entry = await offloader.blocking(store_generated, db, payload, session_id, size=len(payload.rows))
+            publish_created(summary)
+            return cached_json_response(entry, http_request)
             
-            # Validate response structure
-            if not isinstance(n8n_data, dict) or "idea" not in n8n_data or "nodes" not in n8n_data:
-                raise HTTPException(
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise n8n_error_to_http(e)
+
+@router.post("/generate/batch", response_model=BatchGenerateMindMapResponse)
+async def generate_mindmaps_batch(
+    request: BatchGenerateMindMapRequest,
+    http_request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Generate mind maps for many ideas in one call.
+
+    Ideas are sent to n8n with bounded concurrency over a shared connection pool, and
+    finished results are stored in groups of BATCH_INGEST_SIZE per transaction while
+    the remaining calls are still running. Items without a session_id share one new
+    session. Failures are reported per item; the call itself only fails for invalid input.
+
+    The batch is one request for the rate limit: it costs a single token, keyed by client
+    IP, so its throughput follows the n8n concurrency rather than the request rate. Each
+    n8n call holds one of the GENERATE_MAX_CONCURRENT slots shared with /generate.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch contains no items")
+    if len(request.items) > N8N_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {N8N_BATCH_MAX_ITEMS} items")
+
+    client_ip = http_request.client.host if http_request.client else None
+    try:
+        generate_admission.charge(client_ip)
+    except AdmissionRejected as e:
+        raise n8n_error_to_http(e)
+
+    concurrency = max(1, min(request.concurrency or N8N_BATCH_CONCURRENCY, N8N_BATCH_MAX_CONCURRENCY))
+    default_session_id = str(uuid.uuid4())
+    session_ids = [item.session_id or default_session_id for item in request.items]
+
+    # One lookup/commit for all sessions instead of one per idea
+    user_agent = http_request.headers.get("user-agent")
+    get_or_create_sessions(db, session_ids, client_ip, user_agent)
+
+    results: List[Optional[BatchGenerateItemResult]] = [None] * len(request.items)
+    finished: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(index: int, client: httpx.AsyncClient):
+        async with semaphore:
+            try:
+                async with generate_admission.slot():
+                    payload = await n8n_policy.call(request.items[index].idea, client)
+            except Exception as e:
+                error = n8n_error_to_http(e)
+                results[index] = BatchGenerateItemResult(
+                    index=index,
+                    idea=request.items[index].idea,
+                    status="failed",
+                    session_id=session_ids[index],
+                    status_code=error.status_code,
+                    error=error.detail
+                )
+                return
+        await finished.put((index, payload))
+
+    def store(group: List[Tuple[int, ParsedMindMap]]):
+        counts: Dict[str, int] = {}
+        for index, _ in group:
+            counts[session_ids[index]] = counts.get(session_ids[index], 0) + 1
+        try:
+            add_session_queries(db, counts, commit=False)
+            db_mindmaps = create_mindmaps_from_payloads(
+                db, [(payload, session_ids[index]) for index, payload in group], commit=False
+            )
+            # Read before the commit expires them, instead of reloading every map afterwards
+            summaries = [mindmap_summary(db_mindmap, len(payload.rows)) for (_, payload), db_mindmap in zip(group, db_mindmaps)]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for index, payload in group:
+                results[index] = BatchGenerateItemResult(
+                    index=index,
+                    idea=request.items[index].idea,
+                    status="failed",
+                    session_id=session_ids[index],
                     status_code=500,
-                    detail="Invalid response format from N8N API"
+                    error=f"Internal server error: {str(e)}"
                 )
-            
-            # Create validated response object
-            validated_response = N8NMindMapResponse(**n8n_data)
-            
-            # Store in database
-            db_mindmap = create_mindmap_from_n8n_response(db, validated_response, session_id)
-            
-            # Increment session query count
-            increment_session_queries(db, session_id)
-            
-            return MindMapResponse.from_orm(db_mindmap)
-            
-    except httpx.TimeoutException:
-        raise HTTPException(
-            status_code=408,
-            detail="Request to N8N API timed out. Please try again."
-        )
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Failed to connect to N8N API: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Internal server error: {str(e)}"
-        )
+            return
+        for (index, payload), summary in zip(group, summaries):
+            results[index] = BatchGenerateItemResult(
+                index=index,
+                idea=request.items[index].idea,
+                status="created",
+                session_id=session_ids[index],
+                mindmap_id=summary.id,
+                node_count=summary.node_count
+            )
+            publish_created(summary)
+
+    async def ingest():
+        group: List[Tuple[int, ParsedMindMap]] = []
+        while True:
+            entry = await finished.get()
+            if entry is not None:
+                group.append(entry)
+            # Flush when the group is full, when nothing else is ready yet, or at the end
+            if group and (entry is None or len(group) >= BATCH_INGEST_SIZE or finished.empty()):
+                await offloader.blocking(store, group, size=sum(len(payload.rows) for _, payload in group))
+                group = []
+            if entry is None:
+                return
+
+    ingest_task = asyncio.ensure_future(ingest())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(timeout=n8n_policy.timeout, limits=limits, transport=n8n_policy.transport) as client:
+            await asyncio.gather(*(fetch(index, client) for index in range(len(request.items))))
+    finally:
+        await finished.put(None)
+        await ingest_task
+
+    succeeded = sum(1 for result in results if result.status == "created")
+    return BatchGenerateMindMapResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
 
 @router.get("/mindmap/{mindmap_id}", response_model=MindMapResponse)
-async def get_mindmap_by_id(mindmap_id: int, db: Session = Depends(get_db)):
+async def get_mindmap_by_id(mindmap_id: int, http_request: Request, db: Session = Depends(get_db)):
     """
-    Get a specific mind map by ID
+    Get a specific mind map by ID.
+
+    Serialized maps are served from mindmap_cache with a strong ETag; a matching
+    If-None-Match gets 304 Not Modified.
     """
-    mindmap = get_mindmap(db, mindmap_id)
-    if not mindmap:
+    entry = mindmap_cache.get(mindmap_id)
+    if entry is None:
+        # Taken before the read: a delete committed while the map is serialized keeps it out of the cache
+        generation = mindmap_cache.generation()
+        # One cheap count query decides whether loading and serializing is worth a worker thread
+        node_count = get_node_counts(db, [mindmap_id]).get(mindmap_id, 0)
+        entry = await offloader.blocking(load_mindmap_entry, db, mindmap_id, generation, size=node_count)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Mind map not found")
+    return cached_json_response(entry, http_request)
+
+@router.get("/mindmap/{mindmap_id}/layout")
+async def get_mindmap_layout(
+    mindmap_id: int,
+    http_request: Request,
+    layout: str = Query("tree", regex=f"^({'|'.join(LAYOUT_TYPES)})$"),
+    level_gap: float = Query(LAYOUT_LEVEL_GAP, gt=0, le=10000),
+    sibling_gap: float = Query(LAYOUT_SIBLING_GAP, gt=0, le=10000),
+    radius_step: float = Query(LAYOUT_RADIUS_STEP, gt=0, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Node coordinates for drawing a stored mind map.
+
+    layout=tree places levels left to right (level_gap apart) with leaves sibling_gap
+    apart; layout=radial puts the idea at the origin and each level on a ring
+    radius_step further out. The result is parallel arrays: node ids[i] is drawn at
+    (x[i], y[i]) and connected to node parents[i], or to the idea at `root` when
+    parents[i] is -1. Layouts are cached per map and parameters, with an ETag.
+    """
+    params = (level_gap, sibling_gap) if layout == "tree" else (radius_step,)
+    key = (mindmap_id, layout) + params
+    entry = layout_cache.get(key)
+    if entry is None:
+        generation = layout_cache.generation()
+        rows = get_layout_rows(db, mindmap_id)
+        if not rows and not get_mindmap_sessions(db, [mindmap_id]):
+            raise HTTPException(status_code=404, detail="Mind map not found")
+        body = await offloader.cpu(
+            render_layout, mindmap_id, [node_id for node_id, _ in rows], [parent_id for _, parent_id in rows],
+            layout, level_gap, sibling_gap, radius_step, size=len(rows)
+        )
+        entry = await offloader.blocking(layout_cache.put, key, body, generation, size=len(rows))
+    return cached_json_response(entry, http_request)
+
+@router.delete("/mindmap/{mindmap_id}", response_model=DeleteMindMapsResponse)
+async def delete_mindmap_by_id(mindmap_id: int, db: Session = Depends(get_db)):
+    """Delete a mind map and all of its nodes"""
+    found = get_mindmap_sessions(db, [mindmap_id])
+    if not found:
         raise HTTPException(status_code=404, detail="Mind map not found")
-    return MindMapResponse.from_orm(mindmap)
+    deleted_count, nodes_deleted = delete_mindmaps(db, [mindmap_id])
+    db.commit()
+    publish_deleted(found)
+    return DeleteMindMapsResponse(mindmaps_deleted=deleted_count, nodes_deleted=nodes_deleted)
+
+@router.post("/delete", response_model=DeleteMindMapsResponse)
+async def delete_mindmaps_by_ids(request: DeleteMindMapsRequest, db: Session = Depends(get_db)):
+    """
+    Delete several mind maps and their nodes in one transaction.
+
+    Ids that do not exist are listed in not_found; the others are still deleted.
+    """
+    ids = list(dict.fromkeys(request.ids))
+    if len(ids) > N8N_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Delete is limited to {N8N_BATCH_MAX_ITEMS} ids")
+
+    found = get_mindmap_sessions(db, ids)
+    deleted_count, nodes_deleted = delete_mindmaps(db, list(found))
+    db.commit()
+    publish_deleted(found)
+    return DeleteMindMapsResponse(
+        mindmaps_deleted=deleted_count,
+        nodes_deleted=nodes_deleted,
+        not_found=[mindmap_id for mindmap_id in ids if mindmap_id not in found]
+    )
+
+@router.delete("/session/{session_id}", response_model=DeleteMindMapsResponse)
+async def delete_session(session_id: str, keep_session: bool = False, db: Session = Depends(get_db)):
+    """Delete all mind maps of a session and, unless keep_session=true, the session itself"""
+    mindmap_ids, nodes_deleted, sessions_deleted = delete_session_mindmaps(
+        db, session_id, delete_session=not keep_session
+    )
+    # With keep_session nothing counts the session itself, so an existing session without maps is looked up
+    if not mindmap_ids and not sessions_deleted and not (keep_session and session_exists(db, session_id)):
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Session not found")
+    db.commit()
+    invalidate_mindmap_caches(mindmap_ids)
+    # One event for the whole session instead of one per deleted map
+    event_broker.publish(session_id, {
+        "type": "session.deleted", "session_id": session_id, "mindmaps_deleted": len(mindmap_ids)
+    })
+    return DeleteMindMapsResponse(
+        mindmaps_deleted=len(mindmap_ids),
+        nodes_deleted=nodes_deleted,
+        sessions_deleted=sessions_deleted
+    )
+
+@router.get("/export")
+def export_mindmaps(
+    session_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    include_raw: bool = True,
+    include_sessions: bool = False,
+    gzip: bool = False
+):
+    """
+    Stream mind maps as NDJSON, one map (metadata plus flattened nodes) per line.
+
+    Filters by session and created_at range ([created_after, created_before)).
+    With include_sessions=true the business sessions are written first ("type": "session"
+    lines), so the file can be loaded into an empty database with /mindmaps/import.
+    With gzip=true the stream is gzip-compressed and offered as a .ndjson.gz download.
+    """
+    def generate():
+        # The stream outlives the request handler, so it uses its own database session
+        db = SessionLocal()
+        try:
+            records = iter_mindmap_records(db, session_id, created_after, created_before, include_raw)
+            if include_sessions:
+                records = itertools.chain(iter_session_records(db, session_id), records)
+            yield from iter_ndjson(records, compress=gzip)
+        finally:
+            db.close()
+
+    filename = "mindmaps.ndjson.gz" if gzip else "mindmaps.ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import")
+async def import_mindmaps(request: Request, defer_indexes: bool = False, db: Session = Depends(get_db)):
+    """
+    Load mind maps (and sessions) from an NDJSON request body in the /mindmaps/export format.
+
+    The body is read as a stream; send it with Content-Encoding: gzip (or as
+    application/gzip) to upload a compressed export. Valid lines are written in large
+    batched transactions, invalid ones are counted and listed in the report. Mind maps
+    and nodes get new ids; parent references inside each map are remapped.
+    defer_indexes=true drops the node indexes for the load and rebuilds them at the end,
+    which is faster for big imports but slows node queries while the import runs.
+    """
+    compressed = (
+        request.headers.get("content-encoding", "").lower() in ("gzip", "deflate")
+        or request.headers.get("content-type", "").startswith("application/gzip")
+    )
+    reader = NDJSONLineReader(compressed=compressed)
+    importer = MindMapImporter(
+        db,
+        defer_indexes=defer_indexes,
+        on_created=publish_imported
+    )
+
+    try:
+        async for chunk in request.stream():
+            lines = reader.feed(chunk)
+            if lines:
+                # Validation and batch writes are blocking work; keep them off the event loop
+                await run_in_threadpool(importer.add_lines, lines)
+        await run_in_threadpool(importer.add_lines, reader.finish())
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid compressed body: {str(e)}")
+    finally:
+        report = await run_in_threadpool(importer.finish)
+    return report
 
 @router.get("/session/{session_id}/mindmaps", response_model=List[MindMapSummaryResponse])
 async def get_session_mindmaps(
@@ -115,18 +503,44 @@ async def get_session_mindmaps(
     """
     mindmaps = get_mindmaps_by_session(db, session_id, skip, limit)
     
-    # Convert to summary response
-    summaries = []
-    for mindmap in mindmaps:
-        summaries.append(MindMapSummaryResponse(
-            id=mindmap.id,
-            idea=mindmap.idea,
-            created_at=mindmap.created_at,
-            node_count=len(mindmap.nodes),
-            session_id=mindmap.session_id
-        ))
-    
-    return summaries
+    # Node counts for the whole page in one grouped query instead of loading every map's nodes
+    node_counts = get_node_counts(db, [mindmap.id for mindmap in mindmaps])
+    return [mindmap_summary(mindmap, node_counts.get(mindmap.id, 0)) for mindmap in mindmaps]
+
+@router.get("/session/{session_id}/events")
+async def stream_session_events(session_id: str, request: Request):
+    """
+    Server-Sent Events stream of changes to a session's mind maps, replacing polling
+    of /session/{session_id}/mindmaps.
+
+    Events: mindmap.created (the same summary as the listing), mindmap.deleted and
+    session.deleted. A slow client loses the oldest buffered events; the next event
+    then has a "dropped" count and the client should refetch the listing.
+    """
+    try:
+        subscription = event_broker.subscribe(session_id)
+    except SubscriberLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield b": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/recent", response_model=List[MindMapSummaryResponse])
 async def get_recent_mindmaps_endpoint(
@@ -139,17 +553,8 @@ async def get_recent_mindmaps_endpoint(
     """
     mindmaps = get_recent_mindmaps(db, skip, limit)
     
-    summaries = []
-    for mindmap in mindmaps:
-        summaries.append(MindMapSummaryResponse(
-            id=mindmap.id,
-            idea=mindmap.idea,
-            created_at=mindmap.created_at,
-            node_count=len(mindmap.nodes),
-            session_id=mindmap.session_id
-        ))
-    
-    return summaries
+    node_counts = get_node_counts(db, [mindmap.id for mindmap in mindmaps])
+    return [mindmap_summary(mindmap, node_counts.get(mindmap.id, 0)) for mindmap in mindmaps]
 
 @router.get("/session/{session_id}/stats")
 async def get_session_statistics(session_id: str, db: Session = Depends(get_db)):
@@ -161,12 +566,34 @@ async def get_session_statistics(session_id: str, db: Session = Depends(get_db))
         raise HTTPException(status_code=404, detail="Session not found")
     return stats
 
+@router.get("/sessions/stats", response_model=SessionStatsPage)
+async def get_many_sessions_statistics(
+    session_id: Optional[List[str]] = Query(None),
+    active_after: Optional[datetime] = None,
+    active_before: Optional[datetime] = None,
+    sort: str = Query("last_activity", regex=f"^({'|'.join(SESSION_STATS_SORT_KEYS)})$"),
+    order: str = Query("desc", regex="^(asc|desc)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Statistics for many sessions at once: repeat session_id to pick sessions and/or give
+    a last_activity window. Sorted by `sort` (default most recently active first) and
+    paginated; the cost is four queries regardless of the page size.
+    """
+    total, sessions = get_sessions_stats(
+        db, session_id, active_after, active_before, sort, order == "desc", skip, limit
+    )
+    return SessionStatsPage(total=total, skip=skip, limit=limit, sessions=sessions)
+
 @router.get("/analytics")
 async def get_analytics(db: Session = Depends(get_db)):
     """
     Get overall analytics for mind map usage
     """
-    return get_mindmap_analytics(db)
+    # The keyword scan reads every mind map; always run it off the event loop
+    return await offloader.blocking(get_mindmap_analytics, db)
 
 @router.post("/test-n8n")
 async def test_n8n_connection():
@@ -195,13 +622,31 @@ async def test_n8n_connection():
             "timestamp": datetime.utcnow().isoformat()
         }
 
+@router.post("/retention/run")
+async def run_retention():
+    """Apply the retention policy now and return the run report"""
+    report = await run_in_threadpool(retention.run_once)
+    if report is None:
+        raise HTTPException(status_code=409, detail="A retention run is already in progress")
+    return report
+
 # Health check endpoint
 @router.get("/health")
 async def health_check():
     """
-    Simple health check endpoint
+    Simple health check endpoint, including the n8n circuit breaker state
+    and the /generate admission queue
     """
+    n8n = n8n_policy.snapshot()
     return {
-        "status": "healthy",
-        "service": "mindmap-api"
+        "status": "degraded" if n8n["circuit"]["state"] != "closed" else "healthy",
+        "service": "mindmap-api",
+        "n8n": n8n,
+        "admission": generate_admission.snapshot(),
+        "mindmap_cache": mindmap_cache.stats(),
+        "layout_cache": layout_cache.stats(),
+        "retention": retention.snapshot(),
+        "events": event_broker.snapshot(),
+        "offload": offloader.snapshot(),
+        "event_loop": loop_lag.snapshot()
     }
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.profiling import ProfileStore
+
+router = APIRouter()
+
+# Filled by ProfilingMiddleware, which app.py installs when PROFILING_ENABLED is set
+profile_store = ProfileStore()
+
+@router.get("/")
+async def list_profiles():
+    """Recently profiled requests, newest first"""
+    return profile_store.list()
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("speedscope", regex="^(speedscope|collapsed)$")):
+    """
+    Download a request profile: speedscope JSON (open at https://www.speedscope.app)
+    or collapsed stacks for flamegraph tools.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if profile.running:
+        raise HTTPException(status_code=409, detail="The profiled request has not finished yet")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.speedscope()
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
-from app.models import get_db
-from app.schemas import User, UserCreate, UserUpdate
-from app.crud import get_users, get_user, get_user_by_username, create_user, update_user, delete_user
+from typing import List, Optional
+from app.models import get_db, User as UserModel
+from app.schemas import User, UserCreate, UserUpdate, UserBulkUpdate, BulkDeleteRequest, BulkRowResult, BulkResponse
+from app.crud import (
+    get_users, get_user, get_user_by_username, create_user, update_user, delete_user,
+    get_existing_ids, get_taken_user_fields, bulk_insert_rows, bulk_update_rows, bulk_delete_rows
+)
+from app.api.bulk import check_bulk_size, bulk_id_results, bulk_response, bulk_transaction
 
 router = APIRouter()
 
@@ -12,6 +16,79 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     users = get_users(db, skip=skip, limit=limit)
     return users
 
+@router.post("/bulk", response_model=BulkResponse)
+def create_users_bulk(users: List[UserCreate], db: Session = Depends(get_db)):
+    """
+    Create many users in a single transaction.
+
+    Usernames and emails are checked against the database with one query and against
+    the other rows of the request; conflicting rows are reported and skipped.
+    """
+    check_bulk_size(users)
+    taken_usernames, taken_emails = get_taken_user_fields(
+        db, [user.username for user in users], [user.email for user in users]
+    )
+    results: List[BulkRowResult] = []
+    rows = []
+    for index, user in enumerate(users):
+        if user.username in taken_usernames:
+            results.append(BulkRowResult(index=index, status="failed", error="Username already registered"))
+        elif user.email in taken_emails:
+            results.append(BulkRowResult(index=index, status="failed", error="Email already registered"))
+        else:
+            taken_usernames[user.username] = taken_emails[user.email] = -1
+            results.append(BulkRowResult(index=index, status="created"))
+            rows.append(user.dict())
+
+    with bulk_transaction(db):
+        ids = iter(bulk_insert_rows(db, UserModel, rows))
+    for result in results:
+        if result.status == "created":
+            result.id = next(ids)
+    return bulk_response(results)
+
+@router.put("/bulk", response_model=BulkResponse)
+def update_users_bulk(users: List[UserBulkUpdate], db: Session = Depends(get_db)):
+    """
+    Update many users in a single transaction. Only the fields sent for a row are changed.
+    A new username or email must not belong to another user or another row of the request.
+    """
+    check_bulk_size(users)
+    ids = [user.id for user in users]
+    taken_usernames, taken_emails = get_taken_user_fields(
+        db,
+        [user.username for user in users if user.username is not None],
+        [user.email for user in users if user.email is not None]
+    )
+
+    def claim_fields(index: int) -> Optional[str]:
+        user = users[index]
+        if user.username is not None and taken_usernames.get(user.username, user.id) != user.id:
+            return "Username already registered"
+        if user.email is not None and taken_emails.get(user.email, user.id) != user.id:
+            return "Email already registered"
+        if user.username is not None:
+            taken_usernames[user.username] = user.id
+        if user.email is not None:
+            taken_emails[user.email] = user.id
+        return None
+
+    results, accepted = bulk_id_results(ids, get_existing_ids(db, UserModel, ids), "User", "updated", claim_fields)
+    updates = [(users[index].id, users[index].dict(exclude_unset=True, exclude={"id"})) for index in accepted]
+    with bulk_transaction(db):
+        bulk_update_rows(db, UserModel, updates)
+    return bulk_response(results)
+
+@router.post("/bulk-delete", response_model=BulkResponse)
+def delete_users_bulk(request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    """Delete many users with one DELETE ... WHERE id IN (...)"""
+    check_bulk_size(request.ids)
+    existing = get_existing_ids(db, UserModel, request.ids)
+    results, accepted = bulk_id_results(request.ids, existing, "User", "deleted")
+    with bulk_transaction(db):
+        bulk_delete_rows(db, UserModel, [request.ids[index] for index in accepted])
+    return bulk_response(results)
+
 @router.get("/{user_id}", response_model=User)
 def read_user(user_id: int, db: Session = Depends(get_db)):
     db_user = get_user(db, user_id=user_id)
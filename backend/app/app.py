@@ -1,14 +1,27 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.config.config import SECRET_KEY, ALLOWED_ORIGINS
-from app.api import root, data, users, mindmaps
+from app.config.config import SECRET_KEY, ALLOWED_ORIGINS, QUERY_DEBUG_HEADERS, RETENTION_ENABLED, PROFILING_ENABLED
+from app.api import root, data, users, mindmaps, profiles
 from app.models import create_tables
+from app.middleware import SecretHeaderMiddleware, QueryDebugHeadersMiddleware
+from app.profiling import ProfilingMiddleware
+from app.offload import offloader, loop_lag
 
 app = FastAPI()
 
 # Initialize database tables
 create_tables()
 
+# Middleware added last runs first: CORS wraps the secret check so that preflight
+# requests are answered and 403 responses still carry CORS headers
+if QUERY_DEBUG_HEADERS:
+    app.add_middleware(QueryDebugHeadersMiddleware)
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, store=profiles.profile_store, secret=SECRET_KEY)
+
+app.add_middleware(SecretHeaderMiddleware, secret=SECRET_KEY)
+
 # Add CORS middleware for cross-origin requests
 app.add_middleware(
     CORSMiddleware,
@@ -18,16 +31,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    loop_lag.start()
+
+@app.on_event("shutdown")
+async def stop_offload():
+    await loop_lag.stop()
+    offloader.shutdown()
+
+if RETENTION_ENABLED:
+    @app.on_event("startup")
+    async def start_retention():
+        mindmaps.retention.start()
 
-@app.middleware("http")
-async def verify_secret_header(request: Request, call_next):
-    if request.method == "OPTIONS":
-        return await call_next(request)
-    if request.headers.get("x-app-secret") != SECRET_KEY:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    return await call_next(request)
+    @app.on_event("shutdown")
+    async def stop_retention():
+        await mindmaps.retention.stop()
 
 app.include_router(root.router)
 app.include_router(data.router, prefix="/data")
 app.include_router(users.router, prefix="/users")
 app.include_router(mindmaps.router, prefix="/mindmaps", tags=["mindmaps"])
+if PROFILING_ENABLED:
+    app.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
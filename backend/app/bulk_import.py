@@ -0,0 +1,347 @@
+import json
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError, constr
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.config.config import (
+    IMPORT_BATCH_NODES, IMPORT_BATCH_MAPS, IMPORT_MAX_ERRORS, N8N_MAX_TITLE_LENGTH, N8N_MAX_IDEA_LENGTH
+)
+from app.crud import acquire_write_lock
+from app.models import MindMap, MindMapNode, BusinessSession
+from app.n8n_payload import N8NPayloadError, N8NPayloadLimits, parse_n8n_payload
+
+# Exported maps may be larger than n8n replies are allowed to be, but titles and ideas
+# must still fit their columns, as for flattened nodes
+IMPORT_TREE_LIMITS = N8NPayloadLimits(max_body_bytes=None, max_depth=None, max_nodes=None)
+
+# Secondary indexes dropped during a deferred-index import and rebuilt at the end
+DEFERRABLE_INDEXES = [index for index in MindMapNode.__table__.indexes if index.name != "ix_mindmap_nodes_id"]
+
+NODE_INSERT_COLUMNS = ("id", "node_id", "title", "parent_id", "mindmap_id", "level", "order_index", "created_at")
+NODE_INSERT_SQL = (
+    f"INSERT INTO {MindMapNode.__tablename__} ({', '.join(NODE_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in NODE_INSERT_COLUMNS)})"
+)
+
+
+class ImportRecordError(ValueError):
+    """A single NDJSON line could not be imported"""
+
+
+class NDJSONLineReader:
+    """Split a stream of (optionally gzip/zlib compressed) byte chunks into NDJSON lines"""
+
+    def __init__(self, compressed: bool = False):
+        # wbits 47 accepts both gzip and zlib headers
+        self.decompressor = zlib.decompressobj(47) if compressed else None
+        self.remainder = b""
+        self.line_number = 0
+
+    def _split(self, data: bytes) -> List[Tuple[int, bytes]]:
+        lines = data.split(b"\n")
+        self.remainder = lines.pop()
+        numbered = []
+        for line in lines:
+            self.line_number += 1
+            numbered.append((self.line_number, line))
+        return numbered
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, bytes]]:
+        if self.decompressor is not None:
+            chunk = self.decompressor.decompress(chunk)
+        return self._split(self.remainder + chunk)
+
+    def finish(self) -> List[Tuple[int, bytes]]:
+        data = self.remainder
+        if self.decompressor is not None:
+            data += self.decompressor.flush()
+        return self._split(data + b"\n")
+
+
+class MindMapImportRecord(BaseModel):
+    """Top-level fields of an exported mind map line; nodes are checked separately for speed"""
+    idea: constr(max_length=N8N_MAX_IDEA_LENGTH)
+    session_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    raw_data: Optional[Dict[str, Any]] = None
+
+
+class SessionImportRecord(BaseModel):
+    session_id: str
+    user_ip: Optional[str] = None
+    user_agent: Optional[str] = None
+    total_queries: int = 0
+    created_at: Optional[datetime] = None
+    last_activity: Optional[datetime] = None
+
+
+INT_NODE_FIELDS = ("id", "node_id", "level", "order_index")
+
+
+def _flat_nodes(nodes: List[Any]) -> List[Tuple[int, int, str, Optional[int], int, int]]:
+    """Validate exported (flattened) nodes: (id, node_id, title, parent_id, level, order_index)"""
+    rows = []
+    seen = set()
+    for node in nodes:
+        if not isinstance(node, dict):
+            raise ImportRecordError("nodes: every node must be an object")
+        get = node.get
+        row = (get("id"), get("node_id"), get("title"), get("parent_id"), get("level", 0), get("order_index", 0))
+        # One combined check per node; work out which field is wrong only on failure
+        if (type(row[0]) is not int or type(row[1]) is not int or type(row[4]) is not int
+                or type(row[5]) is not int or (row[3] is not None and type(row[3]) is not int)):
+            for field in INT_NODE_FIELDS + ("parent_id",):
+                value = get(field, 0)
+                if type(value) is not int and not (field == "parent_id" and value is None):
+                    raise ImportRecordError(f"nodes: {field} must be an integer")
+        if type(row[2]) is not str or len(row[2]) > N8N_MAX_TITLE_LENGTH:
+            raise ImportRecordError(f"nodes: title must be a string of at most {N8N_MAX_TITLE_LENGTH} characters")
+        if row[0] in seen:
+            raise ImportRecordError(f"nodes: duplicate node id {row[0]}")
+        seen.add(row[0])
+        rows.append(row)
+    for row in rows:
+        if row[3] is not None and row[3] not in seen:
+            raise ImportRecordError(f"nodes: parent_id {row[3]} is not a node of this mind map")
+    return rows
+
+
+def _tree_from_flat(idea: str, rows: List[Tuple[int, int, str, Optional[int], int, int]]) -> Dict[str, Any]:
+    """Rebuild the n8n style raw_data tree from flattened nodes (when a record has no raw_data)"""
+    entries = {row[0]: {"id": row[1], "title": row[2], "children": []} for row in rows}
+    roots = []
+    for row in sorted(rows, key=lambda r: (r[4], r[5])):
+        siblings = entries[row[3]]["children"] if row[3] is not None else roots
+        siblings.append(entries[row[0]])
+    return {"idea": idea, "nodes": roots}
+
+
+class MindMapImporter:
+    """
+    Imports NDJSON mind map records (the /mindmaps/export format) in batched transactions.
+
+    Lines are validated one at a time and buffered until IMPORT_BATCH_NODES nodes or
+    IMPORT_BATCH_MAPS maps are pending. Each batch is then written in one transaction:
+    missing sessions, mind maps and nodes are all inserted with executemany, with primary
+    keys assigned up front so node parent references can be remapped without round trips.
+
+    Besides mind maps, lines with "type": "session" create BusinessSession rows.
+    Mind maps may carry exported flattened nodes or an n8n style tree (nodes with children).
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        batch_nodes: int = IMPORT_BATCH_NODES,
+        batch_maps: int = IMPORT_BATCH_MAPS,
+        defer_indexes: bool = False,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_created: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        self.db = db
+        self.batch_nodes = batch_nodes
+        self.batch_maps = batch_maps
+        self.defer_indexes = defer_indexes
+        self.progress = progress
+        self.on_created = on_created
+        self.pending_maps: List[Tuple[int, MindMapImportRecord, Dict[str, Any], list]] = []
+        self.pending_sessions: Dict[str, Dict[str, Any]] = {}
+        self.pending_nodes = 0
+        self.started = time.perf_counter()
+        self.indexes_dropped = False
+        self.summary: Dict[str, Any] = {
+            "lines": 0,
+            "mindmaps": 0,
+            "nodes": 0,
+            "sessions": 0,
+            "failed": 0,
+            "batches": 0,
+            "errors": [],
+        }
+
+    def _error(self, line_number: int, message: str) -> None:
+        self.summary["failed"] += 1
+        if len(self.summary["errors"]) < IMPORT_MAX_ERRORS:
+            self.summary["errors"].append({"line": line_number, "error": message})
+
+    def add_line(self, line: bytes, line_number: int) -> None:
+        line = line.strip()
+        if not line:
+            return
+        self.summary["lines"] += 1
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ImportRecordError("line is not a JSON object")
+            if data.get("type") == "session":
+                self._add_session(data)
+            else:
+                self._add_mindmap(data, line_number)
+        except (ValueError, ValidationError) as e:
+            self._error(line_number, str(e))
+            return
+
+        if self.pending_nodes >= self.batch_nodes or len(self.pending_maps) >= self.batch_maps:
+            self.flush()
+
+    def add_lines(self, lines: List[Tuple[int, bytes]]) -> None:
+        for line_number, line in lines:
+            self.add_line(line, line_number)
+
+    def _add_session(self, data: Dict[str, Any]) -> None:
+        record = SessionImportRecord(**data)
+        now = datetime.utcnow()
+        self.pending_sessions[record.session_id] = {
+            "session_id": record.session_id,
+            "user_ip": record.user_ip,
+            "user_agent": record.user_agent,
+            "total_queries": record.total_queries,
+            "created_at": record.created_at or now,
+            "last_activity": record.last_activity or record.created_at or now,
+        }
+
+    def _add_mindmap(self, data: Dict[str, Any], line_number: int) -> None:
+        record = MindMapImportRecord(**data)
+        nodes = data.get("nodes", [])
+        if not isinstance(nodes, list):
+            raise ImportRecordError("nodes must be a list")
+
+        if nodes and isinstance(nodes[0], dict) and "children" in nodes[0]:
+            # n8n style tree: flatten it the same way /generate does
+            try:
+                parsed = parse_n8n_payload({"idea": record.idea, "nodes": nodes}, IMPORT_TREE_LIMITS)
+            except N8NPayloadError as e:
+                raise ImportRecordError(str(e))
+            rows = [
+                (index, row.node_id, row.title, row.parent_index, row.level, row.order_index)
+                for index, row in enumerate(parsed.rows)
+            ]
+            raw_data = record.raw_data or parsed.raw_data
+        else:
+            rows = _flat_nodes(nodes)
+            raw_data = record.raw_data or _tree_from_flat(record.idea, rows)
+
+        if record.session_id and record.session_id not in self.pending_sessions:
+            now = datetime.utcnow()
+            self.pending_sessions[record.session_id] = {
+                "session_id": record.session_id,
+                "user_ip": None,
+                "user_agent": None,
+                "total_queries": 0,
+                "created_at": record.created_at or now,
+                "last_activity": record.created_at or now,
+            }
+        self.pending_maps.append((line_number, record, raw_data, rows))
+        self.pending_nodes += len(rows)
+
+    def _drop_indexes(self) -> None:
+        for index in DEFERRABLE_INDEXES:
+            index.drop(bind=self.db.connection(), checkfirst=True)
+        self.db.commit()
+        self.indexes_dropped = True
+
+    def flush(self) -> None:
+        """Write all pending records in one transaction"""
+        if not self.pending_maps and not self.pending_sessions:
+            return
+        if self.defer_indexes and not self.indexes_dropped:
+            self._drop_indexes()
+
+        db = self.db
+        dialect = db.get_bind().dialect
+        process_datetime = MindMapNode.__table__.c.created_at.type.dialect_impl(dialect).bind_processor(dialect)
+        maps, sessions = self.pending_maps, self.pending_sessions
+        self.pending_maps, self.pending_sessions, self.pending_nodes = [], {}, 0
+        try:
+            # Take SQLite's write lock first so the max(id) reads below cannot race other writers
+            acquire_write_lock(db, MindMap)
+
+            existing = set()
+            session_ids = list(sessions)
+            for start in range(0, len(session_ids), 500):
+                existing.update(
+                    session_id for (session_id,) in db.query(BusinessSession.session_id).filter(
+                        BusinessSession.session_id.in_(session_ids[start:start + 500])
+                    )
+                )
+            new_sessions = [values for session_id, values in sessions.items() if session_id not in existing]
+            if new_sessions:
+                db.execute(BusinessSession.__table__.insert(), new_sessions)
+
+            now = datetime.utcnow()
+            next_map_id = (db.query(func.max(MindMap.id)).scalar() or 0) + 1
+            next_node_id = (db.query(func.max(MindMapNode.id)).scalar() or 0) + 1
+            map_params = []
+            node_rows = []
+            for offset, (_, record, raw_data, rows) in enumerate(maps):
+                mindmap_id = next_map_id + offset
+                map_params.append({
+                    "id": mindmap_id,
+                    "idea": record.idea,
+                    "session_id": record.session_id,
+                    "raw_data": raw_data,
+                    "created_at": record.created_at or now,
+                    "updated_at": record.updated_at or record.created_at or now,
+                })
+                created_at = process_datetime(record.created_at or now)
+                new_ids = {row[0]: next_node_id + index for index, row in enumerate(rows)}
+                node_rows.extend(
+                    (new_ids[row[0]], row[1], row[2], new_ids[row[3]] if row[3] is not None else None,
+                     mindmap_id, row[4], row[5], created_at)
+                    for row in rows
+                )
+                next_node_id += len(rows)
+
+            if map_params:
+                db.execute(MindMap.__table__.insert(), map_params)
+            if node_rows:
+                # Nodes go to the driver as plain tuples: at a million rows SQLAlchemy's
+                # per-row parameter processing costs several times the insert itself
+                db.connection().exec_driver_sql(NODE_INSERT_SQL, node_rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            first_line = maps[0][0] if maps else 0
+            self.summary["failed"] += len(maps)
+            if len(self.summary["errors"]) < IMPORT_MAX_ERRORS:
+                self.summary["errors"].append({"line": first_line, "error": f"Batch of {len(maps)} failed: {e}"})
+            return
+
+        self.summary["batches"] += 1
+        self.summary["mindmaps"] += len(map_params)
+        self.summary["nodes"] += len(node_rows)
+        self.summary["sessions"] += len(new_sessions)
+        if self.progress:
+            self.progress(self.report())
+        if self.on_created:
+            self.on_created([
+                {**{key: params[key] for key in ("id", "idea", "session_id", "created_at")}, "node_count": len(rows)}
+                for params, (_, _, _, rows) in zip(map_params, maps)
+            ])
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            **self.summary,
+            "elapsed_s": round(elapsed, 3),
+            "mindmaps_per_s": round(self.summary["mindmaps"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "nodes_per_s": round(self.summary["nodes"] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """Write what is left, rebuild deferred indexes and refresh planner statistics"""
+        self.flush()
+        if self.indexes_dropped:
+            for index in DEFERRABLE_INDEXES:
+                index.create(bind=self.db.connection(), checkfirst=True)
+            self.db.commit()
+            self.indexes_dropped = False
+        self.db.execute(text("PRAGMA optimize"))
+        self.db.commit()
+        return self.report()
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.config.config import RESPONSE_CACHE_COMPRESS_MIN_BYTES
+
+MAX_TOMBSTONES = 10000  # Recently invalidated groups remembered for put(..., generation=...)
+
+
+class CacheEntry(NamedTuple):
+    body: bytes          # gzip-compressed when `compressed` is set, else raw JSON
+    compressed: bool
+    etag: str            # Strong ETag of the uncompressed JSON, quoted
+    size: int            # Bytes charged against the cache budget
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized JSON responses, bounded by total bytes rather than entry count.
+
+    Bodies larger than RESPONSE_CACHE_COMPRESS_MIN_BYTES are kept gzip-compressed; they
+    are sent as-is to clients that accept gzip and decompressed for the rest.
+
+    Keys belong to a group (`group(key)`, the key itself by default), e.g. all layouts of
+    one mind map. Invalidating a group leaves a tombstone, so a body read from the
+    database before the invalidation is not stored afterwards: take generation() before
+    the read and pass it to put().
+    """
+
+    def __init__(self, max_bytes: int, compress_min_bytes: int = RESPONSE_CACHE_COMPRESS_MIN_BYTES,
+                 group: Callable[[Hashable], Hashable] = lambda key: key):
+        self.max_bytes = max_bytes
+        self.compress_min_bytes = compress_min_bytes
+        self.group = group
+        self.entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.generation_counter = 0
+        self.tombstones: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.forgotten_generation = 0  # Newest generation of a tombstone dropped from `tombstones`
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self) -> int:
+        return self.generation_counter
+
+    def _invalidated_since(self, group: Hashable, generation: int) -> bool:
+        invalidated = self.tombstones.get(group)
+        if invalidated is None:
+            return self.forgotten_generation > generation
+        return invalidated > generation
+
+    def _tombstone(self, group: Hashable) -> None:
+        self.generation_counter += 1
+        self.tombstones.pop(group, None)
+        self.tombstones[group] = self.generation_counter
+        while len(self.tombstones) > MAX_TOMBSTONES:
+            _, self.forgotten_generation = self.tombstones.popitem(last=False)
+
+    def put(self, key: Hashable, body: bytes, generation: Optional[int] = None) -> CacheEntry:
+        """
+        Store a serialized JSON body and return its entry (not stored if larger than the
+        whole budget, or if its group was invalidated after `generation`)
+        """
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        compressed = len(body) >= self.compress_min_bytes
+        if compressed:
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+        entry = CacheEntry(body, compressed, etag, len(body) + 100)
+
+        if entry.size > self.max_bytes:
+            return entry
+        with self.lock:
+            if generation is not None and self._invalidated_since(self.group(key), generation):
+                return entry
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self.entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+        return entry
+
+    def invalidate_groups(self, groups: Iterable[Hashable]) -> None:
+        """Drop every entry in `groups`, including bodies still being built for them"""
+        groups = set(groups)
+        if not groups:
+            return
+        with self.lock:
+            for group in groups:
+                self._tombstone(group)
+            for key in [key for key in self.entries if self.group(key) in groups]:
+                self.bytes -= self.entries.pop(key).size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(if_none_match: str, etags) -> bool:
+    """Weak comparison as required for If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {_opaque_tag(candidate) for candidate in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def cached_json_response(entry: CacheEntry, request: Request) -> Response:
+    """
+    Build the response for a cache entry, answering 304 when the client already has it.
+    Only GET and HEAD are conditional; other methods (POST /generate) get plain JSON.
+    """
+    if request.method not in ("GET", "HEAD"):
+        body = gzip.decompress(entry.body) if entry.compressed else entry.body
+        return Response(content=body, media_type="application/json")
+
+    send_gzip = entry.compressed and "gzip" in request.headers.get("accept-encoding", "")
+    # The gzip representation gets its own strong ETag; either one satisfies If-None-Match
+    gzip_etag = entry.etag[:-1] + '-gzip"'
+    headers = {
+        "ETag": gzip_etag if send_gzip else entry.etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, (entry.etag, gzip_etag)):
+        return Response(status_code=304, headers=headers)
+
+    body = entry.body
+    if send_gzip:
+        headers["Content-Encoding"] = "gzip"
+    elif entry.compressed:
+        body = gzip.decompress(body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,125 @@
+"""
+Command line tools for the Mind Map database.
+
+    python -m app.cli export --output mindmaps.ndjson.gz --session-id abc --since 2024-01-01
+    python -m app.cli import mindmaps.ndjson.gz
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config.config import DATABASE_URL, IMPORT_BATCH_NODES
+from app.export import iter_mindmap_records, iter_session_records, iter_ndjson
+from app.bulk_import import MindMapImporter, NDJSONLineReader
+from app.models import Base, ensure_indexes
+
+
+def open_session(database_url: str):
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def export_command(args) -> int:
+    compress = args.gzip or (args.output or "").endswith(".gz")
+    db = open_session(args.database_url)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    count = 0
+    try:
+        def counted(records):
+            nonlocal count
+            for record in records:
+                count += 1
+                yield record
+
+        records = iter_mindmap_records(
+            db,
+            session_id=args.session_id,
+            created_after=args.since,
+            created_before=args.until,
+            include_raw=not args.no_raw,
+        )
+        if args.include_sessions:
+            records = itertools.chain(iter_session_records(db, args.session_id), records)
+        for chunk in iter_ndjson(counted(records), compress=compress):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        db.close()
+    print(f"Exported {count} records", file=sys.stderr)
+    return 0
+
+
+def import_command(args) -> int:
+    db = open_session(args.database_url)
+    Base.metadata.create_all(bind=db.get_bind())
+    ensure_indexes(bind=db.get_bind())
+
+    def progress(report):
+        print(
+            f"{report['mindmaps']} mind maps, {report['nodes']} nodes in {report['elapsed_s']:.1f}s "
+            f"({report['nodes_per_s']:.0f} nodes/s, {report['failed']} failed)",
+            file=sys.stderr
+        )
+
+    importer = MindMapImporter(
+        db,
+        batch_nodes=args.batch_nodes,
+        defer_indexes=not args.keep_indexes,
+        progress=None if args.quiet else progress,
+    )
+    source = open(args.input, "rb") if args.input != "-" else sys.stdin.buffer
+    compressed = args.gzip or args.input.endswith(".gz")
+    reader = NDJSONLineReader(compressed=compressed)
+    try:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            importer.add_lines(reader.feed(chunk))
+        importer.add_lines(reader.finish())
+    finally:
+        report = importer.finish()
+        if args.input != "-":
+            source.close()
+        db.close()
+
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    return 1 if report["failed"] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Mind Map database tools")
+    parser.add_argument("--database-url", default=DATABASE_URL, help=f"SQLAlchemy URL (default: {DATABASE_URL})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write mind maps as NDJSON (one map with its nodes per line)")
+    export.add_argument("--output", "-o", help="Output file; .gz enables gzip (default: stdout)")
+    export.add_argument("--gzip", action="store_true", help="Gzip the output")
+    export.add_argument("--session-id", help="Only export this session")
+    export.add_argument("--since", type=datetime.fromisoformat, help="created_at >= this ISO timestamp")
+    export.add_argument("--until", type=datetime.fromisoformat, help="created_at < this ISO timestamp")
+    export.add_argument("--no-raw", action="store_true", help="Leave out the raw n8n response")
+    export.add_argument("--include-sessions", action="store_true",
+                        help="Write the business sessions first, for a full backup")
+    export.set_defaults(handler=export_command)
+
+    load = commands.add_parser("import", help="Load an NDJSON export (mind maps and sessions) into the database")
+    load.add_argument("input", help="NDJSON file, .gz is decompressed; - reads stdin")
+    load.add_argument("--gzip", action="store_true", help="Input is gzip-compressed")
+    load.add_argument("--batch-nodes", type=int, default=IMPORT_BATCH_NODES,
+                      help=f"Nodes written per transaction (default: {IMPORT_BATCH_NODES})")
+    load.add_argument("--keep-indexes", action="store_true",
+                      help="Keep node indexes during the load instead of rebuilding them at the end")
+    load.add_argument("--quiet", "-q", action="store_true", help="No progress output")
+    load.set_defaults(handler=import_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,100 @@ ALLOWED_ORIGINS = ["*"]
 SECRET_KEY = "secret-key-not-expose-backend-outside-app"
 
 # Database Configuration
-DATABASE_URL = "sqlite:///./app_database.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app_database.db")
 
 # For async SQLite operations
-ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./app_database.db"
\ No newline at end of file
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./app_database.db"
+
+# N8N Configuration
+N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "http://localhost:5678/webhook-test/mindmap")
+N8N_REQUEST_TIMEOUT = float(os.getenv("N8N_REQUEST_TIMEOUT", "30"))  # seconds
+
+# N8N call policy
+N8N_CALL_DEADLINE = float(os.getenv("N8N_CALL_DEADLINE", "45"))  # seconds across all attempts
+N8N_MAX_ATTEMPTS = int(os.getenv("N8N_MAX_ATTEMPTS", "3"))
+N8N_BACKOFF_BASE = float(os.getenv("N8N_BACKOFF_BASE", "0.2"))  # seconds, doubled per retry with full jitter
+N8N_BACKOFF_MAX = float(os.getenv("N8N_BACKOFF_MAX", "2"))
+N8N_HEDGE_PERCENTILE = float(os.getenv("N8N_HEDGE_PERCENTILE", "0"))  # e.g. 95 to hedge slow calls, 0 disables
+N8N_HEDGE_MIN_SAMPLES = int(os.getenv("N8N_HEDGE_MIN_SAMPLES", "20"))
+N8N_BREAKER_FAILURE_THRESHOLD = int(os.getenv("N8N_BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failed attempts
+N8N_BREAKER_RESET_TIMEOUT = float(os.getenv("N8N_BREAKER_RESET_TIMEOUT", "30"))  # seconds before a trial call
+
+# Admission control for /mindmaps/generate
+GENERATE_MAX_CONCURRENT = int(os.getenv("GENERATE_MAX_CONCURRENT", "16"))  # Requests waiting on n8n at once
+GENERATE_MAX_QUEUE = int(os.getenv("GENERATE_MAX_QUEUE", "64"))  # Requests waiting for a slot
+GENERATE_MAX_QUEUE_WAIT = float(os.getenv("GENERATE_MAX_QUEUE_WAIT", "10"))  # seconds
+SESSION_RATE_PER_MINUTE = float(os.getenv("SESSION_RATE_PER_MINUTE", "30"))  # Token bucket refill per session
+SESSION_BURST = int(os.getenv("SESSION_BURST", "10"))  # Token bucket capacity per session
+SESSION_BUCKETS_MAX = 10000  # Least recently used session buckets beyond this are dropped
+
+# Bulk item/user endpoints
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "1000"))  # Rows per bulk request (one transaction)
+
+# Batch generation
+N8N_BATCH_MAX_ITEMS = int(os.getenv("N8N_BATCH_MAX_ITEMS", "1000"))
+N8N_BATCH_CONCURRENCY = int(os.getenv("N8N_BATCH_CONCURRENCY", "8"))  # Default parallel n8n calls per batch
+N8N_BATCH_MAX_CONCURRENCY = int(os.getenv("N8N_BATCH_MAX_CONCURRENCY", "32"))
+BATCH_INGEST_SIZE = int(os.getenv("BATCH_INGEST_SIZE", "50"))  # Mind maps stored per transaction
+
+# N8N response limits
+N8N_MAX_BODY_BYTES = int(os.getenv("N8N_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+N8N_MAX_DEPTH = int(os.getenv("N8N_MAX_DEPTH", "32"))  # Levels below the root nodes
+N8N_MAX_NODES = int(os.getenv("N8N_MAX_NODES", "5000"))
+N8N_MAX_TITLE_LENGTH = int(os.getenv("N8N_MAX_TITLE_LENGTH", "255"))  # Matches MindMapNode.title
+N8N_MAX_IDEA_LENGTH = 500  # Matches MindMap.idea
+
+# Response caching
+MINDMAP_CACHE_MAX_BYTES = int(os.getenv("MINDMAP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_COMPRESS_MIN_BYTES = 2048  # Smaller cached bodies are kept uncompressed
+LAYOUT_CACHE_MAX_BYTES = int(os.getenv("LAYOUT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # Cached node layouts
+
+# Default node spacing for /mindmaps/mindmap/{id}/layout, in viewer pixels
+LAYOUT_LEVEL_GAP = 220.0
+LAYOUT_SIBLING_GAP = 40.0
+LAYOUT_RADIUS_STEP = 160.0
+
+# NDJSON export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))  # Mind maps read per query
+EXPORT_WRITE_BUFFER_BYTES = 64 * 1024  # Bytes collected before a chunk is sent/written
+
+# NDJSON import
+IMPORT_BATCH_NODES = int(os.getenv("IMPORT_BATCH_NODES", "50000"))  # Nodes written per transaction
+IMPORT_BATCH_MAPS = int(os.getenv("IMPORT_BATCH_MAPS", "2000"))  # Mind maps written per transaction
+IMPORT_MAX_ERRORS = 100  # Invalid lines listed in the import report (all are counted)
+
+# Session event stream (Server-Sent Events)
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))  # Buffered events per subscriber, oldest dropped
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000"))
+EVENTS_MAX_SUBSCRIBERS_PER_SESSION = int(os.getenv("EVENTS_MAX_SUBSCRIBERS_PER_SESSION", "5"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))  # Comment line sent when idle
+
+# Retention and compaction (0 disables a limit)
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "0") == "1"  # Run the background retention task
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))  # Delete mind maps older than this
+RETENTION_MAX_MAPS_PER_SESSION = int(os.getenv("RETENTION_MAX_MAPS_PER_SESSION", "0"))  # Keep the newest N per session
+RETENTION_MAX_DB_BYTES = int(os.getenv("RETENTION_MAX_DB_BYTES", "0"))  # Delete oldest mind maps above this size
+RETENTION_SESSION_IDLE_DAYS = float(os.getenv("RETENTION_SESSION_IDLE_DAYS", "0"))  # Delete sessions without mind maps idle this long
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))  # Mind maps deleted per transaction
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "1000"))  # Pages freed per incremental_vacuum step
+RETENTION_CONVERT_AUTO_VACUUM = os.getenv("RETENTION_CONVERT_AUTO_VACUUM", "0") == "1"  # One-time full VACUUM if needed
+
+# CPU-heavy stages (payload parsing, tree building, serialization, layout) off the event loop
+OFFLOAD_MODE = os.getenv("OFFLOAD_MODE", "thread")  # thread, process (pure stages in worker processes) or off
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", "1"))  # Threads share the GIL: more workers add event loop lag, not speed
+OFFLOAD_MIN_NODES = int(os.getenv("OFFLOAD_MIN_NODES", "200"))  # Smaller maps are handled inline on the loop
+OFFLOAD_MIN_BODY_BYTES = int(os.getenv("OFFLOAD_MIN_BODY_BYTES", str(32 * 1024)))  # Smaller n8n replies are parsed inline
+LOOP_LAG_INTERVAL_SECONDS = 0.25  # How often event loop lag is sampled
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "200"))  # Log a warning when the loop is blocked this long
+
+# On-demand request profiling (requests with X-App-Secret and X-Profile: 1)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"  # Off: the middleware is not installed at all
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "1"))  # Sampling interval
+PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "20"))  # Kept in memory, oldest dropped
+PROFILING_MAX_SECONDS = 30  # Sampling stops after this, for long streaming responses
+
+# Query instrumentation
+QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", "0") == "1"  # Add X-DB-* headers to responses
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))  # Log queries slower than this
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))  # Same query shape this often in one request is flagged
@@ -1,5 +1,7 @@
+from sqlalchemy import func, select, bindparam, or_, text
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import List, Optional, Dict, Any, Tuple, Set
 from datetime import datetime
 from app.models import Item, User, MindMap, MindMapNode, BusinessSession
 from app.schemas import (
@@ -7,6 +9,7 @@ from app.schemas import (
     MindMapCreate, MindMapNodeCreate, BusinessSessionCreate,
     N8NMindMapResponse
 )
+from app.n8n_payload import NodeRow, ParsedMindMap, parse_n8n_payload, UNBOUNDED_LIMITS
 
 # Item CRUD operations
 def get_item(db: Session, item_id: int) -> Optional[Item]:
@@ -75,6 +78,78 @@ def delete_user(db: Session, user_id: int) -> bool:
         return True
     return False
 
+# Bulk operations (no commit; the caller commits the whole request at once)
+def acquire_write_lock(db: Session, model) -> None:
+    """
+    Start the write transaction now, with a no-op UPDATE on the table about to be written.
+
+    Bulk inserts assign primary keys themselves as max(id) + 1. SQLite locks the whole
+    database for writing, so once the lock is held no other connection can insert the
+    same ids between that read and the commit.
+    """
+    db.execute(text(f"UPDATE {model.__tablename__} SET id = id WHERE 0"))
+
+def get_existing_ids(db: Session, model, ids: List[int]) -> Set[int]:
+    return {row_id for (row_id,) in db.query(model.id).filter(model.id.in_(ids))}
+
+def bulk_insert_rows(db: Session, model, rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert rows with a single executemany, assigning primary keys up front; returns the new ids"""
+    if not rows:
+        return []
+    acquire_write_lock(db, model)
+    next_id = (db.query(func.max(model.id)).scalar() or 0) + 1
+    ids = list(range(next_id, next_id + len(rows)))
+    db.execute(model.__table__.insert(), [{**row, "id": row_id} for row_id, row in zip(ids, rows)])
+    return ids
+
+def bulk_update_rows(db: Session, model, updates: List[Tuple[int, Dict[str, Any]]]) -> None:
+    """
+    Apply per-row updates without loading the rows.
+
+    Rows that get the same values share one UPDATE ... WHERE id IN (...); the rest are
+    sent as one executemany per set of updated columns.
+    """
+    table = model.__table__
+    same_values: Dict[Tuple, List[int]] = {}
+    for row_id, values in updates:
+        if values:
+            same_values.setdefault(tuple(sorted(values.items())), []).append(row_id)
+
+    by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for items, ids in same_values.items():
+        if len(ids) > 1:
+            db.execute(table.update().where(table.c.id.in_(ids)).values(dict(items)))
+        else:
+            columns = tuple(column for column, _ in items)
+            by_columns.setdefault(columns, []).append(
+                {"row_id": ids[0], **{f"new_{column}": value for column, value in items}}
+            )
+
+    for columns, params in by_columns.items():
+        statement = table.update().where(table.c.id == bindparam("row_id")).values(
+            {column: bindparam(f"new_{column}") for column in columns}
+        )
+        db.execute(statement, params)
+
+def bulk_delete_rows(db: Session, model, ids: List[int]) -> int:
+    if not ids:
+        return 0
+    return db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+
+def get_taken_user_fields(db: Session, usernames: List[str], emails: List[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """One query for which usernames and emails are already registered, mapped to the owning user id"""
+    if not usernames and not emails:
+        return {}, {}
+    rows = db.query(User.id, User.username, User.email).filter(
+        or_(User.username.in_(usernames), User.email.in_(emails))
+    )
+    taken_usernames: Dict[str, int] = {}
+    taken_emails: Dict[str, int] = {}
+    for user_id, username, email in rows:
+        taken_usernames[username] = user_id
+        taken_emails[email] = user_id
+    return taken_usernames, taken_emails
+
 # Mind Map CRUD operations
 def create_mindmap(db: Session, mindmap_data: MindMapCreate) -> MindMap:
     """Create a new mind map from n8n response data"""
@@ -88,6 +163,21 @@ def get_mindmap(db: Session, mindmap_id: int) -> Optional[MindMap]:
     """Get a mind map by ID with all its nodes"""
     return db.query(MindMap).filter(MindMap.id == mindmap_id).first()
 
+def load_mindmap_tree(db: Session, mindmap: MindMap) -> MindMap:
+    """
+    Load all nodes of a mind map with one query and link them to their children in memory,
+    so MindMapResponse.from_orm does not lazy-load `children` once per node
+    """
+    nodes = db.query(MindMapNode).filter(MindMapNode.mindmap_id == mindmap.id).order_by(MindMapNode.id).all()
+    children: Dict[int, List[MindMapNode]] = {node.id: [] for node in nodes}
+    for node in nodes:
+        if node.parent_id in children:
+            children[node.parent_id].append(node)
+    for node in nodes:
+        set_committed_value(node, "children", children[node.id])
+    set_committed_value(mindmap, "nodes", nodes)
+    return mindmap
+
 def get_mindmaps_by_session(db: Session, session_id: str, skip: int = 0, limit: int = 100) -> List[MindMap]:
     """Get all mind maps for a specific session"""
     return db.query(MindMap).filter(MindMap.session_id == session_id).offset(skip).limit(limit).all()
@@ -96,45 +186,126 @@ def get_recent_mindmaps(db: Session, skip: int = 0, limit: int = 20) -> List[Min
     """Get recently created mind maps"""
     return db.query(MindMap).order_by(MindMap.created_at.desc()).offset(skip).limit(limit).all()
 
-def create_mindmap_from_n8n_response(db: Session, n8n_response: N8NMindMapResponse, session_id: Optional[str] = None) -> MindMap:
-    """Process n8n response and create mind map with nodes"""
-    
-    # Create the main mind map record
-    mindmap_create = MindMapCreate(
-        idea=n8n_response.idea,
-        session_id=session_id,
-        raw_data=n8n_response.dict()
-    )
-    db_mindmap = create_mindmap(db, mindmap_create)
-    
-    # Process and create nodes recursively
-    def create_nodes_recursive(nodes: List, parent_id: Optional[int] = None, level: int = 0):
-        for index, node in enumerate(nodes):
-            # Create the node
-            db_node = MindMapNode(
-                node_id=node.id,
-                title=node.title,
-                parent_id=parent_id,
-                mindmap_id=db_mindmap.id,
-                level=level,
-                order_index=index
-            )
-            db.add(db_node)
-            db.commit()
-            db.refresh(db_node)
-            
-            # Recursively create children
-            if node.children:
-                create_nodes_recursive(node.children, db_node.id, level + 1)
-    
-    # Create all nodes
-    create_nodes_recursive(n8n_response.nodes)
-    
-    # Refresh to get all related data
+def insert_node_rows(db: Session, trees: List[Tuple[int, List[NodeRow]]]) -> None:
+    """
+    Bulk insert flattened node rows for one or more mind maps in the current transaction.
+
+    `trees` holds (mindmap_id, rows) pairs. Primary keys are assigned up front so
+    parent_id can be filled in without a round trip per node. The caller must already
+    have written to the database in this transaction: SQLite then holds the write
+    lock, so no other connection can insert nodes between reading max(id) and the insert.
+    """
+    if not any(rows for _, rows in trees):
+        return
+    next_id = (db.query(func.max(MindMapNode.id)).scalar() or 0) + 1
+    now = datetime.utcnow()
+    params = []
+    for mindmap_id, rows in trees:
+        first_id = next_id
+        params.extend(
+            {
+                "id": first_id + index,
+                "node_id": row.node_id,
+                "title": row.title,
+                "parent_id": first_id + row.parent_index if row.parent_index is not None else None,
+                "mindmap_id": mindmap_id,
+                "level": row.level,
+                "order_index": row.order_index,
+                "created_at": now,
+            }
+            for index, row in enumerate(rows)
+        )
+        next_id += len(rows)
+    db.execute(MindMapNode.__table__.insert(), params)
+
+def create_mindmaps_from_payloads(db: Session, items: List[Tuple[ParsedMindMap, Optional[str]]],
+                                  commit: bool = True) -> List[MindMap]:
+    """
+    Store several validated n8n payloads (payload, session_id) as mind maps in one transaction.
+    Committing expires the returned maps; with commit=False the caller can read them first.
+    """
+    db_mindmaps = [
+        MindMap(idea=payload.idea, session_id=session_id, raw_data=payload.raw_data)
+        for payload, session_id in items
+    ]
+    db.add_all(db_mindmaps)
+    db.flush()
+
+    insert_node_rows(db, [(db_mindmap.id, payload.rows) for db_mindmap, (payload, _) in zip(db_mindmaps, items)])
+    if commit:
+        db.commit()
+    return db_mindmaps
+
+def create_mindmap_from_payload(db: Session, payload: ParsedMindMap, session_id: Optional[str] = None) -> MindMap:
+    """Store a validated, flattened n8n payload as a mind map with its nodes in one transaction"""
+    db_mindmap = create_mindmaps_from_payloads(db, [(payload, session_id)])[0]
     db.refresh(db_mindmap)
     return db_mindmap
 
+def create_mindmap_from_n8n_response(db: Session, n8n_response: N8NMindMapResponse, session_id: Optional[str] = None) -> MindMap:
+    """Process n8n response and create mind map with nodes"""
+    payload = parse_n8n_payload(n8n_response.dict(), UNBOUNDED_LIMITS)
+    return create_mindmap_from_payload(db, payload, session_id)
+
 # Mind Map Node CRUD operations
+def get_mindmap_sessions(db: Session, mindmap_ids: List[int]) -> Dict[int, Optional[str]]:
+    """session_id of each existing mind map in `mindmap_ids`"""
+    return dict(db.query(MindMap.id, MindMap.session_id).filter(MindMap.id.in_(mindmap_ids)).all())
+
+def get_node_counts(db: Session, mindmap_ids: List[int]) -> Dict[int, int]:
+    """Node count per mind map with one grouped query (maps without nodes are left out)"""
+    if not mindmap_ids:
+        return {}
+    return dict(
+        db.query(MindMapNode.mindmap_id, func.count(MindMapNode.id)).filter(
+            MindMapNode.mindmap_id.in_(mindmap_ids)
+        ).group_by(MindMapNode.mindmap_id).all()
+    )
+
+def get_layout_rows(db: Session, mindmap_id: int) -> List[Tuple[int, Optional[int]]]:
+    """(id, parent_id) of a mind map's nodes in sibling order, without loading node objects"""
+    return db.query(MindMapNode.id, MindMapNode.parent_id).filter(
+        MindMapNode.mindmap_id == mindmap_id
+    ).order_by(MindMapNode.level, MindMapNode.order_index, MindMapNode.id).all()
+
+def delete_mindmaps(db: Session, mindmap_ids: List[int]) -> Tuple[int, int]:
+    """
+    Delete mind maps and all their nodes with two set-based statements in the current transaction.
+
+    Bypasses the ORM cascade (which would load and delete every node one at a time).
+    Returns (mind maps deleted, nodes deleted); the caller commits.
+    """
+    if not mindmap_ids:
+        return 0, 0
+    nodes_deleted = db.query(MindMapNode).filter(
+        MindMapNode.mindmap_id.in_(mindmap_ids)
+    ).delete(synchronize_session=False)
+    mindmaps_deleted = db.query(MindMap).filter(
+        MindMap.id.in_(mindmap_ids)
+    ).delete(synchronize_session=False)
+    return mindmaps_deleted, nodes_deleted
+
+def delete_session_mindmaps(db: Session, session_id: str, delete_session: bool = True) -> Tuple[List[int], int, int]:
+    """
+    Delete every mind map of a session (and the session itself) in the current transaction.
+
+    Nodes go with one DELETE ... WHERE mindmap_id IN (SELECT ...) so the id list never
+    has to be sent back as parameters. Returns (deleted mind map ids, nodes deleted,
+    sessions deleted); the caller commits.
+    """
+    mindmap_ids = [mindmap_id for (mindmap_id,) in db.query(MindMap.id).filter(MindMap.session_id == session_id)]
+    session_maps = select(MindMap.id).where(MindMap.session_id == session_id)
+    nodes_deleted = db.query(MindMapNode).filter(
+        MindMapNode.mindmap_id.in_(session_maps)
+    ).delete(synchronize_session=False)
+    db.query(MindMap).filter(MindMap.session_id == session_id).delete(synchronize_session=False)
+    sessions_deleted = 0
+    if delete_session:
+        sessions_deleted = db.query(BusinessSession).filter(
+            BusinessSession.session_id == session_id
+        ).delete(synchronize_session=False)
+    return mindmap_ids, nodes_deleted, sessions_deleted
+
 def get_mindmap_nodes(db: Session, mindmap_id: int) -> List[MindMapNode]:
     """Get all nodes for a specific mind map, ordered by level and order_index"""
     return db.query(MindMapNode).filter(
@@ -149,6 +320,12 @@ def get_mindmap_root_nodes(db: Session, mindmap_id: int) -> List[MindMapNode]:
     ).order_by(MindMapNode.order_index).all()
 
 # Business Session CRUD operations
+def session_exists(db: Session, session_id: str) -> bool:
+    """Whether a business session with this id exists"""
+    return db.query(
+        db.query(BusinessSession.session_id).filter(BusinessSession.session_id == session_id).exists()
+    ).scalar()
+
 def get_or_create_session(db: Session, session_id: str, user_ip: Optional[str] = None, user_agent: Optional[str] = None) -> BusinessSession:
     """Get existing session or create a new one"""
     db_session = db.query(BusinessSession).filter(BusinessSession.session_id == session_id).first()
@@ -171,6 +348,41 @@ def get_or_create_session(db: Session, session_id: str, user_ip: Optional[str] =
     
     return db_session
 
+def get_or_create_sessions(db: Session, session_ids: List[str], user_ip: Optional[str] = None, user_agent: Optional[str] = None) -> Dict[str, BusinessSession]:
+    """Get or create several sessions with one lookup query and one commit"""
+    now = datetime.utcnow()
+    wanted = set(session_ids)
+    sessions = {
+        db_session.session_id: db_session
+        for db_session in db.query(BusinessSession).filter(BusinessSession.session_id.in_(wanted))
+    }
+    for db_session in sessions.values():
+        db_session.last_activity = now
+    for session_id in wanted - set(sessions):
+        db_session = BusinessSession(**BusinessSessionCreate(
+            session_id=session_id,
+            user_ip=user_ip,
+            user_agent=user_agent
+        ).dict())
+        db.add(db_session)
+        sessions[session_id] = db_session
+    db.commit()
+    return sessions
+
+def add_session_queries(db: Session, counts: Dict[str, int], commit: bool = True) -> None:
+    """Add to the query count of several sessions (session_id -> increment), optionally leaving the transaction open"""
+    now = datetime.utcnow()
+    for session_id, count in counts.items():
+        db.query(BusinessSession).filter(BusinessSession.session_id == session_id).update(
+            {
+                BusinessSession.total_queries: BusinessSession.total_queries + count,
+                BusinessSession.last_activity: now
+            },
+            synchronize_session=False
+        )
+    if commit:
+        db.commit()
+
 def increment_session_queries(db: Session, session_id: str) -> BusinessSession:
     """Increment the query count for a session"""
     db_session = db.query(BusinessSession).filter(BusinessSession.session_id == session_id).first()
@@ -197,6 +409,78 @@ def get_session_stats(db: Session, session_id: str) -> Dict[str, Any]:
         "last_activity": db_session.last_activity
     }
 
+SESSION_STATS_SORT_KEYS = ("last_activity", "created_at", "total_queries", "mindmap_count", "node_count")
+
+def get_sessions_stats(
+    db: Session,
+    session_ids: Optional[List[str]] = None,
+    active_after: Optional[datetime] = None,
+    active_before: Optional[datetime] = None,
+    sort: str = "last_activity",
+    descending: bool = True,
+    skip: int = 0,
+    limit: int = 50,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Statistics for many sessions in a fixed number of queries, whatever the page size.
+
+    Sessions are selected by id and/or by last_activity in [active_after, active_before),
+    sorted and paginated; mind map and node totals for the page come from two GROUP BY
+    queries. Returns (number of matching sessions, page of stats).
+    """
+    sessions = db.query(BusinessSession)
+    if session_ids is not None:
+        sessions = sessions.filter(BusinessSession.session_id.in_(session_ids))
+    if active_after is not None:
+        sessions = sessions.filter(BusinessSession.last_activity >= active_after)
+    if active_before is not None:
+        sessions = sessions.filter(BusinessSession.last_activity < active_before)
+    total = sessions.count()
+
+    def map_stats(ids):
+        return db.query(
+            MindMap.session_id,
+            func.count(MindMap.id).label("mindmap_count"),
+            func.min(MindMap.created_at).label("first_mindmap_at"),
+            func.max(MindMap.created_at).label("last_mindmap_at"),
+        ).filter(MindMap.session_id.in_(ids)).group_by(MindMap.session_id)
+
+    def node_stats(ids):
+        return db.query(
+            MindMap.session_id,
+            func.count(MindMapNode.id).label("node_count"),
+        ).join(MindMapNode, MindMapNode.mindmap_id == MindMap.id).filter(
+            MindMap.session_id.in_(ids)
+        ).group_by(MindMap.session_id)
+
+    # Sorting by an aggregate joins it for the matching sessions only
+    if sort in ("mindmap_count", "node_count"):
+        matching_ids = sessions.with_entities(BusinessSession.session_id).subquery()
+        aggregate = (map_stats if sort == "mindmap_count" else node_stats)(select(matching_ids.c.session_id)).subquery()
+        sessions = sessions.outerjoin(aggregate, aggregate.c.session_id == BusinessSession.session_id)
+        sort_column = func.coalesce(getattr(aggregate.c, sort), 0)
+    else:
+        sort_column = getattr(BusinessSession, sort)
+    order = (sort_column.desc(), BusinessSession.id.desc()) if descending else (sort_column.asc(), BusinessSession.id.asc())
+    page = sessions.order_by(*order).offset(skip).limit(limit).all()
+
+    page_ids = [db_session.session_id for db_session in page]
+    maps = {row.session_id: row for row in map_stats(page_ids)} if page_ids else {}
+    nodes = {row.session_id: row.node_count for row in node_stats(page_ids)} if page_ids else {}
+    return total, [
+        {
+            "session_id": db_session.session_id,
+            "total_queries": db_session.total_queries,
+            "mindmap_count": maps[db_session.session_id].mindmap_count if db_session.session_id in maps else 0,
+            "node_count": nodes.get(db_session.session_id, 0),
+            "created_at": db_session.created_at,
+            "last_activity": db_session.last_activity,
+            "first_mindmap_at": maps[db_session.session_id].first_mindmap_at if db_session.session_id in maps else None,
+            "last_mindmap_at": maps[db_session.session_id].last_mindmap_at if db_session.session_id in maps else None,
+        }
+        for db_session in page
+    ]
+
 # Analytics and reporting
 def get_mindmap_analytics(db: Session) -> Dict[str, Any]:
     """Get overall analytics for mind map usage"""
@@ -205,10 +489,9 @@ def get_mindmap_analytics(db: Session) -> Dict[str, Any]:
     total_nodes = db.query(MindMapNode).count()
     
     # Get most common idea keywords
-    mindmaps = db.query(MindMap).all()
     idea_keywords = {}
-    for mindmap in mindmaps:
-        words = mindmap.idea.lower().split()
+    for (idea,) in db.query(MindMap.idea).yield_per(1000):
+        words = idea.lower().split()
         for word in words:
             if len(word) > 3:  # Only count words longer than 3 characters
                 idea_keywords[word] = idea_keywords.get(word, 0) + 1
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from app.config.config import EVENTS_QUEUE_SIZE, EVENTS_MAX_SUBSCRIBERS, EVENTS_MAX_SUBSCRIBERS_PER_SESSION
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when a new subscription would go over a subscriber cap"""
+
+
+class Subscription:
+    """
+    One subscriber's bounded event buffer.
+
+    A subscriber that does not keep up never slows down publishers: when the buffer is
+    full the oldest event is dropped, and the next event delivered carries the number of
+    events lost so the client knows to refetch.
+    """
+
+    def __init__(self, session_id: str, maxsize: int):
+        self.session_id = session_id
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=maxsize)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, event: Dict[str, Any]) -> None:
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self.ready.set()
+
+    async def get(self) -> Dict[str, Any]:
+        while not self.events:
+            self.ready.clear()
+            await self.ready.wait()
+        event = self.events.popleft()
+        if self.dropped:
+            event = {**event, "dropped": self.dropped}
+            self.dropped = 0
+        return event
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe of mind map events, keyed by session_id.
+
+    Subscriptions live on the server's event loop. publish() may be called from any
+    thread (request handlers run sync work in the thread pool); events are handed to
+    the loop with call_soon_threadsafe. Publishing to a session without subscribers
+    is a dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = EVENTS_QUEUE_SIZE,
+        max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+        max_per_session: int = EVENTS_MAX_SUBSCRIBERS_PER_SESSION,
+    ):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.max_per_session = max_per_session
+        self.subscriptions: Dict[str, Set[Subscription]] = {}
+        self.subscriber_count = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, session_id: str) -> Subscription:
+        """Register a subscriber; must be called on the event loop"""
+        if self.subscriber_count >= self.max_subscribers:
+            raise SubscriberLimitReached("Too many event subscribers")
+        if len(self.subscriptions.get(session_id, ())) >= self.max_per_session:
+            raise SubscriberLimitReached("Too many event subscribers for this session")
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(session_id, self.queue_size)
+        self.subscriptions.setdefault(session_id, set()).add(subscription)
+        self.subscriber_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self.subscriptions.get(subscription.session_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.subscriber_count -= 1
+            if not subscribers:
+                del self.subscriptions[subscription.session_id]
+
+    def has_subscribers(self, session_id: Optional[str]) -> bool:
+        return session_id in self.subscriptions
+
+    def _deliver(self, session_id: str, event: Dict[str, Any]) -> None:
+        for subscription in list(self.subscriptions.get(session_id, ())):
+            subscription.put(event)
+            self.delivered += 1
+
+    def publish(self, session_id: Optional[str], event: Dict[str, Any]) -> None:
+        if session_id is None or session_id not in self.subscriptions or self.loop is None:
+            return
+        self.published += 1
+        if self.loop.is_closed():
+            return
+        if _running_loop() is self.loop:
+            self._deliver(session_id, event)
+        else:
+            self.loop.call_soon_threadsafe(self._deliver, session_id, event)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self.subscriber_count,
+            "sessions": len(self.subscriptions),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def format_sse(event: Dict[str, Any]) -> bytes:
+    """Encode an event as a Server-Sent Events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'), default=str)}\n\n".encode()
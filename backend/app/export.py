@@ -0,0 +1,140 @@
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config.config import EXPORT_CHUNK_SIZE, EXPORT_WRITE_BUFFER_BYTES
+from app.models import MindMap, MindMapNode, BusinessSession
+
+NODE_FIELDS = ("id", "node_id", "title", "parent_id", "level", "order_index")
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def iter_mindmap_records(
+    db: Session,
+    session_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    include_raw: bool = True,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every matching mind map as a plain dict with its flattened nodes.
+
+    Maps are read in id order, `chunk_size` at a time, with a single query for the
+    nodes of each chunk. Rows are selected as plain columns (no ORM objects) and the
+    read transaction ends after each chunk, so memory stays constant and writers are
+    never blocked for the length of the export. SQLite has no server-side cursors;
+    keyset chunks give the same bounded memory.
+    """
+    columns = [MindMap.id, MindMap.idea, MindMap.session_id, MindMap.created_at, MindMap.updated_at]
+    if include_raw:
+        columns.append(MindMap.raw_data)
+
+    query = db.query(*columns)
+    if session_id is not None:
+        query = query.filter(MindMap.session_id == session_id)
+    if created_after is not None:
+        query = query.filter(MindMap.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(MindMap.created_at < created_before)
+
+    last_id = 0
+    while True:
+        mindmaps = query.filter(MindMap.id > last_id).order_by(MindMap.id).limit(chunk_size).all()
+        if not mindmaps:
+            break
+        last_id = mindmaps[-1].id
+
+        nodes_by_map: Dict[int, List[Dict[str, Any]]] = {mindmap.id: [] for mindmap in mindmaps}
+        node_rows = db.query(
+            MindMapNode.mindmap_id, *(getattr(MindMapNode, field) for field in NODE_FIELDS)
+        ).filter(
+            MindMapNode.mindmap_id.in_(list(nodes_by_map))
+        ).order_by(MindMapNode.mindmap_id, MindMapNode.id)
+        for row in node_rows:
+            nodes_by_map[row[0]].append(dict(zip(NODE_FIELDS, row[1:])))
+        db.rollback()  # End the read transaction between chunks
+
+        for mindmap in mindmaps:
+            record = {
+                "id": mindmap.id,
+                "idea": mindmap.idea,
+                "session_id": mindmap.session_id,
+                "created_at": _isoformat(mindmap.created_at),
+                "updated_at": _isoformat(mindmap.updated_at),
+                "nodes": nodes_by_map[mindmap.id],
+            }
+            if include_raw:
+                record["raw_data"] = mindmap.raw_data
+            yield record
+
+        if len(mindmaps) < chunk_size:
+            break
+
+
+def iter_session_records(
+    db: Session,
+    session_id: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Yield business sessions as {"type": "session", ...} dicts, read in keyset chunks like the mind maps"""
+    query = db.query(
+        BusinessSession.id, BusinessSession.session_id, BusinessSession.user_ip, BusinessSession.user_agent,
+        BusinessSession.total_queries, BusinessSession.created_at, BusinessSession.last_activity
+    )
+    if session_id is not None:
+        query = query.filter(BusinessSession.session_id == session_id)
+
+    last_id = 0
+    while True:
+        sessions = query.filter(BusinessSession.id > last_id).order_by(BusinessSession.id).limit(chunk_size).all()
+        db.rollback()
+        if not sessions:
+            break
+        last_id = sessions[-1].id
+
+        for session in sessions:
+            yield {
+                "type": "session",
+                "session_id": session.session_id,
+                "user_ip": session.user_ip,
+                "user_agent": session.user_agent,
+                "total_queries": session.total_queries,
+                "created_at": _isoformat(session.created_at),
+                "last_activity": _isoformat(session.last_activity),
+            }
+
+        if len(sessions) < chunk_size:
+            break
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]], compress: bool = False,
+                buffer_bytes: int = EXPORT_WRITE_BUFFER_BYTES) -> Iterator[bytes]:
+    """Encode records as NDJSON, optionally gzip-compressed, in chunks of roughly `buffer_bytes`"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer: List[bytes] = []
+    buffered = 0
+
+    for record in records:
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= buffer_bytes:
+            data = b"".join(buffer)
+            buffer, buffered = [], 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b"".join(buffer)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,116 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config.config import SLOW_QUERY_THRESHOLD_MS, N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# Collapse "IN (?, ?, ?)" lists so the same query with a different number of ids has one shape
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def query_shape(statement: str) -> str:
+    """Normalize a SQL statement so repeated executions with different parameters compare equal"""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _IN_LIST_RE.sub("(?)", shape)
+
+
+class QueryStats:
+    """Query count, total DB time and query shapes collected for one request or block"""
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.count = 0
+        self.total_time = 0.0  # seconds
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        shape = query_shape(statement)
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.total_time += duration
+            stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+            stats = stats.parent
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000
+
+    def repeated_shapes(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        """Query shapes executed at least `threshold` times - likely N+1 patterns"""
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+    if duration * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            "Slow query (%.1f ms): %s | parameters: %.500r",
+            duration * 1000, query_shape(statement), parameters
+        )
+
+
+def install_query_instrumentation(engine: Engine) -> None:
+    """Attach query counting and slow-query logging hooks to an engine"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Collect statistics for every query executed inside the block (nested blocks also count towards outer ones)"""
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def report_n_plus_one(stats: QueryStats, label: str) -> Dict[str, int]:
+    """Log query shapes that repeat often enough to look like N+1 lazy loads"""
+    repeated = stats.repeated_shapes()
+    for shape, count in repeated.items():
+        logger.warning("Possible N+1 in %s: %d executions of %s", label, count, shape)
+    return repeated
+
+
+@contextmanager
+def assert_max_queries(max_count: int) -> Iterator[QueryStats]:
+    """
+    Test helper: fail if the block executes more than `max_count` queries.
+
+        with assert_max_queries(3):
+            client.get("/mindmaps/mindmap/1", headers=headers)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_count:
+        shapes = "\n".join(
+            f"  {count}x {shape}"
+            for shape, count in sorted(stats.shapes.items(), key=lambda x: x[1], reverse=True)
+        )
+        raise AssertionError(f"Expected at most {max_count} queries, got {stats.count}:\n{shapes}")
@@ -0,0 +1,134 @@
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LAYOUT_TYPES = ("tree", "radial")
+
+
+class TreeArrays:
+    """
+    A stored mind map as flat arrays indexed by position (no node objects, no recursion).
+
+    `node_ids` and `parent_ids` are database ids in sibling order (order_index, id).
+    `parents` holds the position of each node's parent, -1 for top-level nodes (children
+    of the idea). `preorder` is a depth-first visiting order, `depth` is 0 for top-level
+    nodes and `slot` numbers the leaves top to bottom.
+    """
+
+    def __init__(self, node_ids: Sequence[int], parent_ids: Sequence[Optional[int]]):
+        count = len(node_ids)
+        position = {node_id: i for i, node_id in enumerate(node_ids)}
+        self.node_ids = list(node_ids)
+        # A parent outside the map is treated as top-level rather than failing the layout
+        self.parents = [-1 if parent_id is None else position.get(parent_id, -1) for parent_id in parent_ids]
+        self.first_child = [-1] * count
+        self.last_child = [-1] * count
+        children: List[List[int]] = [[] for _ in range(count)]
+        roots = []
+        for i, parent in enumerate(self.parents):
+            (children[parent] if parent >= 0 else roots).append(i)
+
+        self.depth = [0] * count
+        self.preorder: List[int] = []
+        stack = roots[::-1]
+        while stack:
+            i = stack.pop()
+            self.preorder.append(i)
+            kids = children[i]
+            if kids:
+                self.first_child[i] = kids[0]
+                self.last_child[i] = kids[-1]
+                child_depth = self.depth[i] + 1
+                for child in reversed(kids):
+                    self.depth[child] = child_depth
+                    stack.append(child)
+
+        self.slot = [0.0] * count
+        self.leaves = 0
+        for i in self.preorder:
+            if self.first_child[i] < 0:
+                self.slot[i] = float(self.leaves)
+                self.leaves += 1
+
+    def center_parents(self, values: List[float]) -> List[float]:
+        """Place every inner node midway between its first and last child (children before parents)"""
+        first, last = self.first_child, self.last_child
+        for i in reversed(self.preorder):
+            if first[i] >= 0:
+                values[i] = (values[first[i]] + values[last[i]]) / 2
+        return values
+
+
+def tree_layout(arrays: TreeArrays, level_gap: float, sibling_gap: float) -> Tuple[List[float], List[float]]:
+    """Left-to-right tidy tree: depth along x, leaves evenly spaced along y, parents centered on their children"""
+    y = arrays.center_parents([slot * sibling_gap for slot in arrays.slot])
+    x = [(depth + 1) * level_gap for depth in arrays.depth]
+    return x, y
+
+
+def radial_layout(arrays: TreeArrays, radius_step: float) -> Tuple[List[float], List[float]]:
+    """Idea at the origin, one ring per level, leaves evenly spread around the circle"""
+    step = 2 * math.pi / max(arrays.leaves, 1)
+    angles = arrays.center_parents([slot * step for slot in arrays.slot])
+    x = []
+    y = []
+    for angle, depth in zip(angles, arrays.depth):
+        radius = (depth + 1) * radius_step
+        x.append(radius * math.cos(angle))
+        y.append(radius * math.sin(angle))
+    return x, y
+
+
+def compute_layout(
+    node_ids: Sequence[int],
+    parent_ids: Sequence[Optional[int]],
+    layout: str,
+    level_gap: float,
+    sibling_gap: float,
+    radius_step: float,
+) -> Dict[str, Any]:
+    """
+    Coordinates for every node as parallel arrays the viewer can draw directly:
+    node i is at (x[i], y[i]) and has an edge to node parents[i], or to the idea at
+    `root` when parents[i] is -1.
+    """
+    arrays = TreeArrays(node_ids, parent_ids)
+    if layout == "radial":
+        x, y = radial_layout(arrays, radius_step)
+        root = [0.0, 0.0]
+    else:
+        x, y = tree_layout(arrays, level_gap, sibling_gap)
+        tops = [y[i] for i, parent in enumerate(arrays.parents) if parent < 0]
+        root = [0.0, (min(tops) + max(tops)) / 2 if tops else 0.0]
+
+    x = [round(value, 2) for value in x]
+    y = [round(value, 2) for value in y]
+    return {
+        "ids": arrays.node_ids,
+        "parents": arrays.parents,
+        "x": x,
+        "y": y,
+        "root": root,
+        "bounds": [
+            min(x + [root[0]]), min(y + [root[1]]), max(x + [root[0]]), max(y + [root[1]])
+        ],
+    }
+
+
+def render_layout(
+    mindmap_id: int,
+    node_ids: List[int],
+    parent_ids: List[Optional[int]],
+    layout: str,
+    level_gap: float,
+    sibling_gap: float,
+    radius_step: float,
+) -> bytes:
+    """The layout endpoint's JSON body; plain arguments only, so it can run in a worker process"""
+    body = {
+        "mindmap_id": mindmap_id,
+        "layout": layout,
+        "node_count": len(node_ids),
+        **compute_layout(node_ids, parent_ids, layout, level_gap, sibling_gap, radius_step),
+    }
+    return json.dumps(body, separators=(",", ":")).encode()
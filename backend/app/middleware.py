@@ -0,0 +1,71 @@
+import hmac
+import json
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.instrumentation import count_queries, report_n_plus_one
+
+
+class SecretHeaderMiddleware:
+    """
+    Rejects HTTP requests without the shared X-App-Secret header.
+
+    Plain ASGI: authorized requests are passed to the app with the original receive and
+    send, so request and streaming response bodies are not buffered or copied. Rejected
+    requests get a 403 built once at startup. OPTIONS requests (CORS preflight) and
+    non-HTTP scopes such as lifespan are passed through unchecked.
+    """
+
+    def __init__(self, app: ASGIApp, secret: str, header_name: str = "x-app-secret"):
+        self.app = app
+        self.secret = secret.encode("latin-1")
+        self.header_name = header_name.lower().encode("latin-1")
+        body = json.dumps({"detail": "Forbidden"}, separators=(",", ":")).encode()
+        self.forbidden_body: Message = {"type": "http.response.body", "body": body}
+        self.forbidden_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+
+    def authorized(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                return hmac.compare_digest(value, self.secret)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or self.authorized(scope):
+            await self.app(scope, receive, send)
+            return
+        # Outer middleware (CORS) appends to the headers list, so each response gets its own copy
+        await send({"type": "http.response.start", "status": 403, "headers": list(self.forbidden_headers)})
+        await send(self.forbidden_body)
+
+
+class QueryDebugHeadersMiddleware:
+    """
+    Adds X-DB-Query-Count, X-DB-Query-Time-Ms and X-DB-N-Plus-One to every HTTP response
+    and logs likely N+1 patterns. The counts cover the queries run before the response
+    starts; for streaming responses, queries made while streaming the body are not included.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as stats:
+            async def send_with_headers(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    repeated = report_n_plus_one(stats, f"{scope['method']} {scope['path']}")
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Query-Count"] = str(stats.count)
+                    headers["X-DB-Query-Time-Ms"] = f"{stats.total_time_ms:.2f}"
+                    headers["X-DB-N-Plus-One"] = str(len(repeated))
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
@@ -3,6 +3,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 from app.config.config import DATABASE_URL
+from app.instrumentation import install_query_instrumentation
 
 Base = declarative_base()
 
@@ -36,7 +37,7 @@ class MindMap(Base):
     idea = Column(String(500), nullable=False, index=True)
     session_id = Column(String(100), nullable=True, index=True)  # For grouping related queries
     raw_data = Column(JSON, nullable=False)  # Store the complete n8n response
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship to nodes
@@ -48,8 +49,8 @@ class MindMapNode(Base):
     id = Column(Integer, primary_key=True, index=True)
     node_id = Column(Integer, nullable=False)  # The ID from n8n response
     title = Column(String(255), nullable=False)
-    parent_id = Column(Integer, ForeignKey("mindmap_nodes.id"), nullable=True)
-    mindmap_id = Column(Integer, ForeignKey("mindmaps.id"), nullable=False)
+    parent_id = Column(Integer, ForeignKey("mindmap_nodes.id"), nullable=True, index=True)
+    mindmap_id = Column(Integer, ForeignKey("mindmaps.id"), nullable=False, index=True)
     level = Column(Integer, default=0)  # 0 = root, 1 = first level, etc.
     order_index = Column(Integer, default=0)  # Order within the same level
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -73,11 +74,24 @@ class BusinessSession(Base):
 
 # Database setup
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+install_query_instrumentation(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def create_tables():
     """Create all tables in the database"""
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            # Lets retention shrink the file with incremental_vacuum; only takes effect
+            # on a new database (existing ones need a one-time VACUUM to switch)
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        Base.metadata.create_all(bind=connection)
+    ensure_indexes()
+
+def ensure_indexes(bind=None):
+    """Create indexes added to the models after the tables were first created"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind or engine, checkfirst=True)
 
 def get_db():
     """Dependency to get database session"""
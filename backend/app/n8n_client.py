@@ -0,0 +1,289 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+from app.config.config import (
+    N8N_WEBHOOK_URL, N8N_REQUEST_TIMEOUT, N8N_CALL_DEADLINE, N8N_MAX_ATTEMPTS,
+    N8N_BACKOFF_BASE, N8N_BACKOFF_MAX, N8N_HEDGE_PERCENTILE, N8N_HEDGE_MIN_SAMPLES,
+    N8N_BREAKER_FAILURE_THRESHOLD, N8N_BREAKER_RESET_TIMEOUT, OFFLOAD_MIN_BODY_BYTES
+)
+from app.n8n_payload import ParsedMindMap, read_n8n_body, parse_n8n_body
+from app.offload import offloader
+
+# Status codes worth retrying: generating a mind map has no side effects we need to protect
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class N8NStatusError(Exception):
+    """n8n answered with a non-200 status"""
+
+    def __init__(self, status_code: int, text: str, retry_after: Optional[float] = None):
+        super().__init__(f"N8N API error: {status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling n8n while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("N8N API is unavailable, circuit breaker is open")
+        self.retry_after = retry_after
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, N8NStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed:    calls go through; `failure_threshold` failures in a row open the circuit
+    open:      calls fail fast until `reset_timeout` seconds have passed
+    half_open: one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold: int = N8N_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = N8N_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if calls are currently being rejected, without changing state"""
+        if self.state == "open" and self.retry_after() > 0:
+            raise CircuitOpenError(self.retry_after())
+        if self.state == "half_open" and self.trial_in_flight:
+            raise CircuitOpenError(1.0)
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError; in half-open state only one trial call is admitted"""
+        if self.state == "open":
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.retry_after())
+            self.state = "half_open"
+            self.trial_in_flight = False
+        if self.state == "half_open":
+            if self.trial_in_flight:
+                raise CircuitOpenError(1.0)
+            self.trial_in_flight = True
+
+    def release_trial(self) -> None:
+        """The trial call ended without telling us anything about n8n's health"""
+        self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_after": round(self.retry_after(), 1),
+            "times_opened": self.times_opened,
+        }
+
+
+class N8NCallPolicy:
+    """
+    Calls the n8n webhook with retries, optional hedging and a circuit breaker.
+
+    - Retryable failures (timeouts, connection errors, 429/5xx) are retried up to
+      `max_attempts` times with full-jitter exponential backoff, within `deadline` seconds.
+    - With `hedge_percentile` set, a second request is started when the first one has
+      been running longer than that percentile of recent successful calls; the first
+      good answer wins.
+    - Every failed attempt counts towards the circuit breaker; while it is open calls
+      raise CircuitOpenError immediately.
+    """
+
+    def __init__(
+        self,
+        url: str = N8N_WEBHOOK_URL,
+        timeout: float = N8N_REQUEST_TIMEOUT,
+        deadline: float = N8N_CALL_DEADLINE,
+        max_attempts: int = N8N_MAX_ATTEMPTS,
+        backoff_base: float = N8N_BACKOFF_BASE,
+        backoff_max: float = N8N_BACKOFF_MAX,
+        hedge_percentile: float = N8N_HEDGE_PERCENTILE,
+        hedge_min_samples: int = N8N_HEDGE_MIN_SAMPLES,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while hedging is off or warming up"""
+        if not self.hedge_percentile or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return ordered[index]
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def client(self, timeout: Optional[float] = None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=timeout or self.timeout, transport=self.transport)
+
+    async def _send(self, client: httpx.AsyncClient, idea: str, timeout: float) -> ParsedMindMap:
+        self.breaker.before_call()
+        self.stats["attempts"] += 1
+        started = time.monotonic()
+        try:
+            async with client.stream(
+                "POST",
+                self.url,
+                json={"idea": idea},
+                headers={"Content-Type": "application/json"},
+                timeout=timeout,
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise N8NStatusError(
+                        response.status_code, response.text,
+                        _parse_retry_after(response.headers.get("retry-after"))
+                    )
+                body = await read_n8n_body(response)
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            if _is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_trial()
+            raise
+        self.breaker.record_success()
+        self.latencies.append(time.monotonic() - started)
+        # Large replies are decoded and validated off the event loop
+        return await offloader.cpu(parse_n8n_body, body, size=len(body), min_size=OFFLOAD_MIN_BODY_BYTES)
+
+    async def _send_hedged(self, client: httpx.AsyncClient, idea: str, timeout: float) -> ParsedMindMap:
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._send(client, idea, timeout)
+
+        primary = asyncio.ensure_future(self._send(client, idea, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            return await primary
+        self.stats["hedges"] += 1
+        hedge = asyncio.ensure_future(self._send(client, idea, max(0.1, timeout - delay)))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, idea: str, client: Optional[httpx.AsyncClient] = None) -> ParsedMindMap:
+        """Generate a mind map for `idea`, returning the validated, flattened payload"""
+        self.stats["calls"] += 1
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            self.stats["rejected"] += 1
+            raise
+
+        if client is None:
+            async with self.client() as own_client:
+                return await self._call_with_retries(own_client, idea)
+        return await self._call_with_retries(client, idea)
+
+    async def _call_with_retries(self, client: httpx.AsyncClient, idea: str) -> ParsedMindMap:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return await self._send_hedged(client, idea, min(self.timeout, max(0.1, remaining)))
+            except Exception as e:
+                attempt += 1
+                if not _is_retryable(e) or attempt >= self.max_attempts:
+                    raise
+                wait = self.backoff(attempt - 1)
+                if isinstance(e, N8NStatusError) and e.retry_after is not None:
+                    wait = max(wait, min(e.retry_after, self.backoff_max))
+                if time.monotonic() + wait >= deadline:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 1)
+
+        delay = self.hedge_delay()
+        return {
+            "circuit": self.breaker.snapshot(),
+            "latency_p50_ms": pct(50),
+            "latency_p95_ms": pct(95),
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            **self.stats,
+        }
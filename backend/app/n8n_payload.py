@@ -0,0 +1,174 @@
+import json
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+from pydantic import BaseModel
+
+from app.config.config import (
+    N8N_MAX_BODY_BYTES, N8N_MAX_DEPTH, N8N_MAX_NODES, N8N_MAX_TITLE_LENGTH, N8N_MAX_IDEA_LENGTH
+)
+
+
+class N8NPayloadError(ValueError):
+    """Raised when an n8n reply is malformed or exceeds the configured limits"""
+
+
+class N8NPayloadLimits(BaseModel):
+    """Limits applied while walking an n8n reply (None disables a limit)"""
+    max_body_bytes: Optional[int] = N8N_MAX_BODY_BYTES
+    max_depth: Optional[int] = N8N_MAX_DEPTH
+    max_nodes: Optional[int] = N8N_MAX_NODES
+    max_title_length: Optional[int] = N8N_MAX_TITLE_LENGTH
+    max_idea_length: Optional[int] = N8N_MAX_IDEA_LENGTH
+
+
+UNBOUNDED_LIMITS = N8NPayloadLimits(
+    max_body_bytes=None, max_depth=None, max_nodes=None, max_title_length=None, max_idea_length=None
+)
+
+
+class NodeRow(NamedTuple):
+    """One flattened node, in pre-order so every parent precedes its children"""
+    node_id: int
+    title: str
+    parent_index: Optional[int]  # Index of the parent row, None for root nodes
+    level: int
+    order_index: int
+
+
+class ParsedMindMap(NamedTuple):
+    idea: str
+    rows: List[NodeRow]
+    raw_data: Dict[str, Any]  # Normalized payload, same shape as N8NMindMapResponse.dict()
+
+
+def _coerce_int(value: Any) -> int:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise N8NPayloadError("value is not a valid integer")
+
+
+def _coerce_str(value: Any, max_length: Optional[int]) -> str:
+    if isinstance(value, str):
+        text = value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        text = str(value)
+    else:
+        raise N8NPayloadError("value is not a valid string")
+    if max_length is not None and len(text) > max_length:
+        raise N8NPayloadError(f"longer than {max_length} characters")
+    return text
+
+
+def _node_path(stack: List[list]) -> str:
+    """Location of the node being processed, e.g. nodes.2.children.0 (only built for error messages)"""
+    indices = [str(frame[1] - 1) for frame in stack]
+    if len(indices) > 8:
+        indices = indices[:3] + ["..."] + indices[-3:]
+    return "nodes." + ".children.".join(indices)
+
+
+def parse_n8n_payload(data: Any, limits: Optional[N8NPayloadLimits] = None) -> ParsedMindMap:
+    """
+    Validate an n8n reply without recursion and flatten it into node rows.
+
+    Accepts the same input as N8NMindMapResponse (including its int/str coercions)
+    but walks the tree with an explicit stack, so deep trees cannot hit the
+    recursion limit, and stops as soon as a depth, node count or length limit is hit.
+    """
+    limits = limits or N8NPayloadLimits()
+
+    if not isinstance(data, dict) or "idea" not in data or "nodes" not in data:
+        raise N8NPayloadError("Invalid response format from N8N API")
+
+    try:
+        idea = _coerce_str(data["idea"], limits.max_idea_length)
+    except N8NPayloadError as e:
+        raise N8NPayloadError(f"idea: {e}")
+    if not isinstance(data["nodes"], list):
+        raise N8NPayloadError("nodes: value is not a valid list")
+
+    rows: List[NodeRow] = []
+    raw_nodes: List[Dict[str, Any]] = []
+
+    # Each frame: [nodes at this level, next index, parent row index, level, normalized sibling list]
+    stack: List[list] = [[data["nodes"], 0, None, 0, raw_nodes]]
+    while stack:
+        frame = stack[-1]
+        nodes, index, parent_index, level, raw_siblings = frame
+        if index >= len(nodes):
+            stack.pop()
+            continue
+        frame[1] = index + 1
+
+        node = nodes[index]
+        if not isinstance(node, dict):
+            raise N8NPayloadError(f"{_node_path(stack)}: value is not a valid dict")
+        if "id" not in node or "title" not in node:
+            raise N8NPayloadError(f"{_node_path(stack)}: id and title are required")
+        if limits.max_depth is not None and level >= limits.max_depth:
+            raise N8NPayloadError(f"{_node_path(stack)}: tree deeper than {limits.max_depth} levels")
+        if limits.max_nodes is not None and len(rows) >= limits.max_nodes:
+            raise N8NPayloadError(f"Tree has more than {limits.max_nodes} nodes")
+
+        try:
+            node_id = _coerce_int(node["id"])
+        except N8NPayloadError as e:
+            raise N8NPayloadError(f"{_node_path(stack)}.id: {e}")
+        try:
+            title = _coerce_str(node["title"], limits.max_title_length)
+        except N8NPayloadError as e:
+            raise N8NPayloadError(f"{_node_path(stack)}.title: {e}")
+        children = node.get("children")
+        if children is None:
+            children = []
+        elif not isinstance(children, list):
+            raise N8NPayloadError(f"{_node_path(stack)}.children: value is not a valid list")
+
+        row_index = len(rows)
+        rows.append(NodeRow(node_id, title, parent_index, level, index))
+        raw_children: List[Dict[str, Any]] = []
+        raw_siblings.append({"id": node_id, "title": title, "children": raw_children})
+
+        if children:
+            stack.append([children, 0, row_index, level + 1, raw_children])
+
+    return ParsedMindMap(idea, rows, {"idea": idea, "nodes": raw_nodes})
+
+
+async def read_n8n_body(response: httpx.Response, limits: Optional[N8NPayloadLimits] = None) -> bytes:
+    """Read a streamed n8n response body, aborting once it exceeds max_body_bytes"""
+    limits = limits or N8NPayloadLimits()
+    max_bytes = limits.max_body_bytes
+
+    if max_bytes is not None:
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise N8NPayloadError(f"Response body larger than {max_bytes} bytes")
+
+    chunks = []
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if max_bytes is not None and received > max_bytes:
+            raise N8NPayloadError(f"Response body larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_n8n_body(body: bytes, limits: Optional[N8NPayloadLimits] = None) -> ParsedMindMap:
+    """Decode a raw n8n response body and validate it with parse_n8n_payload"""
+    try:
+        data = json.loads(body)
+    except (ValueError, RecursionError):
+        raise N8NPayloadError("N8N API returned invalid JSON")
+    return parse_n8n_payload(data, limits)
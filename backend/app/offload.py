@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from app.config.config import (
+    OFFLOAD_MODE, OFFLOAD_WORKERS, OFFLOAD_MIN_NODES, LOOP_LAG_INTERVAL_SECONDS, LOOP_LAG_WARN_MS
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CPUOffloader:
+    """
+    Runs CPU-heavy request stages away from the event loop once their input is large.
+
+    Two kinds of stage:
+    - blocking(): work on a SQLAlchemy session or ORM objects (tree building, from_orm,
+      serialization). It must stay in this process, so it always goes to a thread pool.
+    - cpu(): pure functions of picklable arguments (payload parsing, layout). These go
+      to the process pool when mode is "process" and to the thread pool otherwise.
+
+    Inputs smaller than the threshold run inline: for those the hop to a worker costs more
+    than the work. mode "off" runs everything inline. A worker thread still shares the
+    GIL, but the interpreter switches back to the event loop every few milliseconds, so
+    other requests wait at most that long instead of for the whole stage.
+    """
+
+    def __init__(self, mode: str = OFFLOAD_MODE, workers: int = OFFLOAD_WORKERS, min_size: int = OFFLOAD_MIN_NODES):
+        self.mode = mode
+        self.workers = workers
+        self.min_size = min_size
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"inline": 0, "thread": 0, "process": 0}
+
+    def _thread_pool(self) -> Executor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="offload")
+            return self._threads
+
+    def _process_pool(self) -> Executor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            return self._processes
+
+    def _inline(self, size: Optional[int], min_size: Optional[int]) -> bool:
+        return self.mode == "off" or (size is not None and size < (self.min_size if min_size is None else min_size))
+
+    async def _run(self, kind: str, executor: Executor, func: Callable[..., T], *args: Any) -> T:
+        self.stats[kind] += 1
+        loop = asyncio.get_event_loop()
+        call = functools.partial(func, *args)
+        if kind == "thread":
+            # Like run_in_threadpool: the request's context (query stats) follows it into the worker
+            call = functools.partial(contextvars.copy_context().run, call)
+        return await loop.run_in_executor(executor, call)
+
+    async def blocking(self, func: Callable[..., T], *args: Any, size: Optional[int] = None,
+                       min_size: Optional[int] = None) -> T:
+        """
+        Run `func` in the thread pool unless `size` is below `min_size` (default: the
+        offloader's node threshold). size=None always offloads.
+        """
+        if self._inline(size, min_size):
+            self.stats["inline"] += 1
+            return func(*args)
+        return await self._run("thread", self._thread_pool(), func, *args)
+
+    async def cpu(self, func: Callable[..., T], *args: Any, size: Optional[int] = None,
+                  min_size: Optional[int] = None) -> T:
+        """Like blocking(), but uses the process pool in "process" mode; `func` and its arguments must pickle"""
+        if self._inline(size, min_size):
+            self.stats["inline"] += 1
+            return func(*args)
+        if self.mode == "process":
+            return await self._run("process", self._process_pool(), func, *args)
+        return await self._run("thread", self._thread_pool(), func, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for pool in (self._threads, self._processes):
+                if pool is not None:
+                    pool.shutdown(wait=False)
+            self._threads = self._processes = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "workers": self.workers, "min_nodes": self.min_size, "stages": dict(self.stats)}
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a task that sleeps `interval` seconds.
+
+    Lag is the time the loop spent running other callbacks before it got to this one,
+    which is how long any request (including /health) had to wait at that moment.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS, warn_ms: float = LOOP_LAG_WARN_MS, window: int = 120):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.max_ms = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    async def run_forever(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self.samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            if lag_ms >= self.warn_ms:
+                logger.warning("Event loop blocked for %.1f ms", lag_ms)
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = sorted(self.samples)
+        if not samples:
+            return {"running": self.task is not None, "samples": 0}
+        return {
+            "running": self.task is not None,
+            "samples": len(samples),
+            "last_ms": round(self.samples[-1], 2),
+            "p50_ms": round(samples[len(samples) // 2], 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            "max_recent_ms": round(samples[-1], 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+offloader = CPUOffloader()
+loop_lag = LoopLagMonitor()
@@ -0,0 +1,245 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.config import PROFILING_INTERVAL_MS, PROFILING_MAX_PROFILES, PROFILING_MAX_SECONDS
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+Stack = Tuple[Frame, ...]     # Outermost frame first
+
+# Innermost frames of threads that are waiting rather than working; such samples are skipped
+IDLE_FRAMES = {
+    ("select", "selectors.py"),
+    ("wait", "threading.py"),
+    ("get", "queue.py"),
+    ("_worker", "thread.py"),
+}
+MAX_STACK_DEPTH = 200
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for every thread in the process.
+
+    A background thread records the stacks of all other threads every `interval_ms`
+    (the event loop and the thread pool running blocking request work), skipping
+    threads that are idle. Other requests running at the same time show up as well.
+    The GIL can delay the sampler past its interval, so each sample is weighted by the
+    time since the previous one: `samples` maps (thread name, stack) to microseconds.
+    """
+
+    def __init__(self, interval_ms: float = PROFILING_INTERVAL_MS, max_seconds: float = PROFILING_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def _stack(self, frame) -> Stack:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        deadline = last + self.max_seconds
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            if now > deadline:
+                break
+            weight = int((now - last) * 1_000_000)
+            last = now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (code.co_name, os.path.basename(code.co_filename)) in IDLE_FRAMES:
+                    continue
+                self.samples[(names.get(thread_id, str(thread_id)), self._stack(frame))] += weight
+            self.sample_count += 1
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+class Profile:
+    """One profiled request and its samples, exportable as collapsed stacks or speedscope JSON"""
+
+    def __init__(self, method: str, path: str, interval_ms: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.interval_ms = interval_ms
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        self.running = True
+        self.sample_count = 0
+        self.samples: Dict[Tuple[str, Stack], int] = {}  # Microseconds per (thread name, stack)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "running": self.running,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "interval_ms": self.interval_ms,
+            "samples": self.sample_count,
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format (flamegraph.pl, speedscope, inferno): one "a;b;c microseconds" line per stack"""
+        lines = []
+        for (thread_name, stack), microseconds in sorted(self.samples.items(), key=lambda item: -item[1]):
+            frames = ";".join(f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack)
+            lines.append(f"{thread_name};{frames} {microseconds}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Speedscope file (https://www.speedscope.app) with one sampled profile per thread"""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Frame, int] = {}
+        threads: Dict[str, Dict[str, list]] = OrderedDict()
+        for (thread_name, stack), microseconds in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            thread = threads.setdefault(thread_name, {"samples": [], "weights": []})
+            thread["samples"].append(indexes)
+            thread["weights"].append(microseconds / 1000)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.path}",
+            "exporter": "mastermind-backend",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(sum(thread["weights"]), 3),
+                    "samples": thread["samples"],
+                    "weights": thread["weights"],
+                }
+                for thread_name, thread in threads.items()
+            ],
+        }
+
+
+class ProfileStore:
+    """Ring buffer of the last `max_profiles` request profiles"""
+
+    def __init__(self, max_profiles: int = PROFILING_MAX_PROFILES):
+        self.max_profiles = max_profiles
+        self.profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        with self.lock:
+            self.profiles[profile.id] = profile
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self.profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [profile.summary() for profile in reversed(self.profiles.values())]
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests that ask for it with an X-Profile header.
+
+    Only requests that also carry the app secret are profiled, and only one at a time
+    (the sampler sees every thread, so concurrent profiles would mix). The response gets
+    X-Profile-Id, or X-Profile-Status: busy when another profile is running; the profile
+    can be downloaded from /profiles/{id} once the request has finished. The middleware is
+    only installed when PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, secret: str, interval_ms: float = PROFILING_INTERVAL_MS):
+        self.app = app
+        self.store = store
+        self.secret = secret.encode("latin-1")
+        self.interval_ms = interval_ms
+        self.busy = threading.Lock()
+
+    def requested(self, scope: Scope) -> bool:
+        profile = secret = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                profile = value
+            elif name == b"x-app-secret":
+                secret = value
+        return bool(profile) and profile != b"0" and secret is not None and hmac.compare_digest(secret, self.secret)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self.busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_headers(send, {"X-Profile-Status": "busy"}))
+            return
+
+        profile = Profile(scope["method"], scope["path"], self.interval_ms)
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+            await send(message)
+
+        self.store.add(profile)
+        profiler = SamplingProfiler(self.interval_ms)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, self._with_headers(send_with_status, {"X-Profile-Id": profile.id}))
+        finally:
+            profiler.stop()
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            profile.sample_count = profiler.sample_count
+            profile.samples = dict(profiler.samples)
+            profile.running = False
+            self.busy.release()
+
+    @staticmethod
+    def _with_headers(send: Send, extra: Dict[str, str]) -> Send:
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in extra.items():
+                    headers[name] = value
+            await send(message)
+        return send_with_headers
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.config.config import (
+    RETENTION_INTERVAL_SECONDS, RETENTION_MAX_AGE_DAYS, RETENTION_MAX_MAPS_PER_SESSION,
+    RETENTION_MAX_DB_BYTES, RETENTION_SESSION_IDLE_DAYS, RETENTION_BATCH_SIZE,
+    RETENTION_VACUUM_PAGES, RETENTION_CONVERT_AUTO_VACUUM
+)
+from app.crud import delete_mindmaps
+from app.models import MindMap, BusinessSession
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class RetentionPolicy(BaseModel):
+    """What to delete; a limit of 0 is disabled"""
+    max_age_days: float = RETENTION_MAX_AGE_DAYS
+    max_maps_per_session: int = RETENTION_MAX_MAPS_PER_SESSION
+    max_db_bytes: int = RETENTION_MAX_DB_BYTES
+    session_idle_days: float = RETENTION_SESSION_IDLE_DAYS
+    batch_size: int = RETENTION_BATCH_SIZE
+    vacuum_pages: int = RETENTION_VACUUM_PAGES
+    convert_auto_vacuum: bool = RETENTION_CONVERT_AUTO_VACUUM
+
+
+def database_bytes(db: Session) -> Dict[str, int]:
+    """File size and free (reusable) bytes of the SQLite database"""
+    page_size = db.execute(text("PRAGMA page_size")).scalar()
+    page_count = db.execute(text("PRAGMA page_count")).scalar()
+    freelist_count = db.execute(text("PRAGMA freelist_count")).scalar()
+    return {"total": page_count * page_size, "free": freelist_count * page_size}
+
+
+def _expired_ids(db: Session, cutoff: datetime, limit: int) -> Dict[int, Optional[str]]:
+    query = db.query(MindMap.id, MindMap.session_id).filter(MindMap.created_at < cutoff).order_by(MindMap.id).limit(limit)
+    return dict(query.all())
+
+
+def _over_session_cap_ids(db: Session, cap: int, limit: int) -> Dict[int, Optional[str]]:
+    """Mind maps beyond the newest `cap` of their session"""
+    rank = func.row_number().over(
+        partition_by=MindMap.session_id,
+        order_by=(MindMap.created_at.desc(), MindMap.id.desc())
+    ).label("rank")
+    ranked = db.query(MindMap.id, MindMap.session_id, rank).filter(MindMap.session_id.isnot(None)).subquery()
+    query = db.query(ranked.c.id, ranked.c.session_id).filter(ranked.c.rank > cap).limit(limit)
+    return dict(query.all())
+
+
+def _oldest_ids(db: Session, limit: int) -> Dict[int, Optional[str]]:
+    query = db.query(MindMap.id, MindMap.session_id).order_by(MindMap.created_at, MindMap.id).limit(limit)
+    return dict(query.all())
+
+
+class RetentionRun:
+    """Deletes in short transactions and keeps the numbers for the run report"""
+
+    def __init__(self, db: Session, policy: RetentionPolicy,
+                 on_deleted: Optional[Callable[[Dict[int, Optional[str]]], None]] = None):
+        self.db = db
+        self.policy = policy
+        self.on_deleted = on_deleted
+        self.report: Dict[str, Any] = {
+            "started_at": datetime.utcnow().isoformat(),
+            "mindmaps_deleted": 0,
+            "nodes_deleted": 0,
+            "sessions_deleted": 0,
+            "batches": 0,
+            "lock_held_ms": 0.0,
+            "max_lock_held_ms": 0.0,
+        }
+
+    def _locked(self, started: float) -> None:
+        held = (time.perf_counter() - started) * 1000
+        self.report["lock_held_ms"] += held
+        self.report["max_lock_held_ms"] = max(self.report["max_lock_held_ms"], held)
+
+    def delete_batches(self, select_ids: Callable[[], Dict[int, Optional[str]]], max_batches: Optional[int] = None) -> int:
+        """Delete the mind maps returned by `select_ids` ({id: session_id}) one batch per transaction until none are left"""
+        deleted = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            mindmap_ids = select_ids()
+            if not mindmap_ids:
+                break
+            # The id lookup is a plain read; the write lock is only held from here to the commit
+            started = time.perf_counter()
+            mindmaps_deleted, nodes_deleted = delete_mindmaps(self.db, list(mindmap_ids))
+            self.db.commit()
+            self._locked(started)
+
+            batches += 1
+            deleted += mindmaps_deleted
+            self.report["batches"] += 1
+            self.report["mindmaps_deleted"] += mindmaps_deleted
+            self.report["nodes_deleted"] += nodes_deleted
+            if self.on_deleted:
+                self.on_deleted(mindmap_ids)
+        return deleted
+
+    def delete_orphaned_sessions(self, idle_before: datetime) -> None:
+        """Remove idle business sessions that no longer own any mind map"""
+        has_mindmaps = self.db.query(MindMap.id).filter(MindMap.session_id == BusinessSession.session_id).exists()
+        while True:
+            session_ids = [
+                session_id for (session_id,) in self.db.query(BusinessSession.id).filter(
+                    BusinessSession.last_activity < idle_before, ~has_mindmaps
+                ).limit(self.policy.batch_size)
+            ]
+            if not session_ids:
+                break
+            started = time.perf_counter()
+            # Re-checked in the DELETE so a session that just got a new mind map is kept
+            deleted = self.db.query(BusinessSession).filter(
+                BusinessSession.id.in_(session_ids), ~has_mindmaps
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            self._locked(started)
+            self.report["batches"] += 1
+            self.report["sessions_deleted"] += deleted
+            if deleted < len(session_ids):
+                break
+
+    def vacuum(self) -> None:
+        """Return free pages to the file system, `vacuum_pages` pages per transaction"""
+        db = self.db
+        mode = db.execute(text("PRAGMA auto_vacuum")).scalar()
+        if mode != AUTO_VACUUM_INCREMENTAL:
+            if not self.policy.convert_auto_vacuum:
+                self.report["vacuum"] = "skipped: auto_vacuum is not INCREMENTAL (set RETENTION_CONVERT_AUTO_VACUUM=1)"
+                return
+            # One-time conversion; VACUUM rewrites the whole file and locks it while doing so
+            started = time.perf_counter()
+            # Both must run on the same connection for the new mode to stick
+            db.connection().connection.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+            db.commit()
+            self._locked(started)
+            self.report["vacuum"] = "converted to incremental auto_vacuum with a full VACUUM"
+            return
+
+        steps = 0
+        while db.execute(text("PRAGMA freelist_count")).scalar():
+            started = time.perf_counter()
+            # sqlite3's execute() only steps this pragma once (one page); executescript runs it to the end
+            db.connection().connection.executescript(f"PRAGMA incremental_vacuum({int(self.policy.vacuum_pages)});")
+            db.commit()
+            self._locked(started)
+            steps += 1
+        self.report["vacuum"] = f"incremental, {steps} steps"
+
+    def run(self) -> Dict[str, Any]:
+        policy = self.policy
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        before = database_bytes(self.db)
+        self.db.rollback()
+
+        if policy.max_age_days > 0:
+            cutoff = now - timedelta(days=policy.max_age_days)
+            self.delete_batches(lambda: _expired_ids(self.db, cutoff, policy.batch_size))
+
+        if policy.max_maps_per_session > 0:
+            self.delete_batches(lambda: _over_session_cap_ids(self.db, policy.max_maps_per_session, policy.batch_size))
+
+        if policy.max_db_bytes > 0:
+            # Freed pages go to the free list, so the bytes in use drop as batches are deleted
+            while True:
+                size = database_bytes(self.db)
+                self.db.rollback()
+                if size["total"] - size["free"] <= policy.max_db_bytes:
+                    break
+                if not self.delete_batches(lambda: _oldest_ids(self.db, policy.batch_size), max_batches=1):
+                    break
+
+        if policy.session_idle_days > 0:
+            self.delete_orphaned_sessions(now - timedelta(days=policy.session_idle_days))
+
+        self.vacuum()
+        after = database_bytes(self.db)
+        self.db.rollback()
+
+        self.report.update({
+            "bytes_before": before["total"],
+            "bytes_after": after["total"],
+            "bytes_reclaimed": before["total"] - after["total"],
+            "free_bytes_after": after["free"],
+            "lock_held_ms": round(self.report["lock_held_ms"], 2),
+            "max_lock_held_ms": round(self.report["max_lock_held_ms"], 2),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+        return self.report
+
+
+class RetentionRunner:
+    """
+    Applies a RetentionPolicy once or periodically in the background.
+
+    Runs are serialized: a run requested while another is in progress is skipped.
+    `on_deleted` receives {mind map id: session_id} for every deleted batch
+    (to invalidate caches and notify subscribers).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        policy: Optional[RetentionPolicy] = None,
+        interval: float = RETENTION_INTERVAL_SECONDS,
+        on_deleted: Optional[Callable[[Dict[int, Optional[str]]], None]] = None,
+    ):
+        self.session_factory = session_factory
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.on_deleted = on_deleted
+        self.lock = threading.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Apply the policy now; returns None when a run is already in progress"""
+        if not self.lock.acquire(blocking=False):
+            return None
+        db = self.session_factory()
+        try:
+            report = RetentionRun(db, self.policy, self.on_deleted).run()
+        finally:
+            db.close()
+            self.lock.release()
+        self.runs += 1
+        self.last_report = report
+        logger.info(
+            "Retention run: %d mind maps, %d nodes, %d sessions deleted, %d bytes reclaimed, "
+            "locks held %.1f ms (max %.1f ms)",
+            report["mindmaps_deleted"], report["nodes_deleted"], report["sessions_deleted"],
+            report["bytes_reclaimed"], report["lock_held_ms"], report["max_lock_held_ms"]
+        )
+        return report
+
+    async def run_forever(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(None, self.run_once)
+            except Exception:
+                logger.exception("Retention run failed")
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self.task is not None,
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "last_report": self.last_report,
+        }
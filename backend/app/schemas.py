@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, constr
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
+from app.config.config import N8N_MAX_IDEA_LENGTH
+
 # Item schemas
 class ItemBase(BaseModel):
     title: str
@@ -47,6 +49,28 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+# Bulk schemas
+class ItemBulkUpdate(ItemUpdate):
+    id: int
+
+class UserBulkUpdate(UserUpdate):
+    id: int
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[int]
+
+class BulkRowResult(BaseModel):
+    index: int
+    status: str  # "created", "updated", "deleted" or "failed"
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BulkRowResult]
+
 # Mind Map schemas
 class MindMapNodeBase(BaseModel):
     node_id: int
@@ -112,10 +136,55 @@ class BusinessSessionResponse(BusinessSessionBase):
     class Config:
         orm_mode = True
 
+class SessionStatsResponse(BaseModel):
+    session_id: str
+    total_queries: int
+    mindmap_count: int
+    node_count: int
+    created_at: datetime
+    last_activity: datetime
+    first_mindmap_at: Optional[datetime] = None
+    last_mindmap_at: Optional[datetime] = None
+
+class SessionStatsPage(BaseModel):
+    total: int
+    skip: int
+    limit: int
+    sessions: List[SessionStatsResponse]
+
 # Request/Response schemas for API endpoints
 class GenerateMindMapRequest(BaseModel):
+    idea: constr(max_length=N8N_MAX_IDEA_LENGTH)  # Longer ideas would be rejected after the n8n call
+    session_id: Optional[str] = None
+
+class BatchGenerateMindMapRequest(BaseModel):
+    items: List[GenerateMindMapRequest]
+    concurrency: Optional[int] = None  # Parallel n8n calls, capped by N8N_BATCH_MAX_CONCURRENCY
+
+class BatchGenerateItemResult(BaseModel):
+    index: int
     idea: str
+    status: str  # "created" or "failed"
     session_id: Optional[str] = None
+    mindmap_id: Optional[int] = None
+    node_count: Optional[int] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchGenerateMindMapResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchGenerateItemResult]
+
+class DeleteMindMapsRequest(BaseModel):
+    ids: List[int]
+
+class DeleteMindMapsResponse(BaseModel):
+    mindmaps_deleted: int
+    nodes_deleted: int
+    sessions_deleted: int = 0
+    not_found: List[int] = []
 
 class MindMapSummaryResponse(BaseModel):
     id: int
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the CRUD, schema and middleware hot paths that set per-request cost.
+
+Every run uses a fresh temporary SQLite file filled with generated data. Results are
+written as JSON; when a baseline report is given, the run fails (exit code 1) if any
+benchmark's median time grew by more than the allowed regression budget.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --budget 0.25
+    python benchmark.py --only ingest validation --sizes 10 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, MindMap, MindMapNode, BusinessSession
+from app.schemas import N8NMindMapResponse, MindMapResponse
+from app.crud import (
+    create_mindmap_from_payload, get_mindmap, get_mindmap_analytics,
+    get_recent_mindmaps, get_mindmaps_by_session, get_node_counts, load_mindmap_tree
+)
+from app.n8n_payload import N8NPayloadError, parse_n8n_payload, UNBOUNDED_LIMITS
+from app.middleware import SecretHeaderMiddleware
+from fake_n8n import build_tree, TREE_SHAPES
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GROUPS = ("ingest", "validation", "from_orm", "analytics", "listing", "middleware")
+
+BENCH_SECRET = "benchmark-secret"
+
+IDEA_WORDS = [
+    "AI-powered", "sustainable", "subscription", "marketplace", "platform", "delivery",
+    "fitness", "education", "healthcare", "blockchain", "logistics", "analytics",
+]
+
+
+def measure(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Time `func` `repeat` times (after one warm-up call) and summarize in milliseconds"""
+    if setup:
+        setup()
+    try:
+        func()
+    except RecursionError:
+        return {"error": "RecursionError"}
+
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.mean(timings), 4),
+        "max_ms": round(max(timings), 4),
+    }
+
+
+def make_payload(shape: str, size: int) -> Dict[str, Any]:
+    return {"idea": f"Benchmark {shape} {size}", "nodes": build_tree(shape, size)}
+
+
+def seed_mindmaps(SessionFactory, count: int, nodes_per_map: int, sessions: int, seed: int = 42):
+    """Insert `count` mind maps with flat node lists using bulk inserts"""
+    rng = random.Random(seed)
+    db = SessionFactory()
+    try:
+        now = datetime.utcnow()
+        session_ids = [f"bench-session-{i}" for i in range(sessions)]
+        db.bulk_insert_mappings(BusinessSession, [
+            {"session_id": sid, "total_queries": 0, "created_at": now, "last_activity": now}
+            for sid in session_ids
+            if not db.query(BusinessSession.id).filter(BusinessSession.session_id == sid).first()
+        ])
+
+        first_id = (db.query(MindMap.id).order_by(MindMap.id.desc()).limit(1).scalar() or 0) + 1
+        maps = []
+        nodes = []
+        for offset in range(count):
+            mindmap_id = first_id + offset
+            maps.append({
+                "id": mindmap_id,
+                "idea": " ".join(rng.sample(IDEA_WORDS, 4)),
+                "session_id": session_ids[offset % sessions],
+                "raw_data": {"idea": "seeded", "nodes": []},
+                "created_at": now - timedelta(seconds=count - offset),
+                "updated_at": now,
+            })
+            for index in range(nodes_per_map):
+                nodes.append({
+                    "node_id": index + 1,
+                    "title": f"Node {index + 1}",
+                    "mindmap_id": mindmap_id,
+                    "level": 0,
+                    "order_index": index,
+                    "created_at": now,
+                })
+        db.bulk_insert_mappings(MindMap, maps)
+        db.bulk_insert_mappings(MindMapNode, nodes)
+        db.commit()
+    finally:
+        db.close()
+
+
+def middleware_apps() -> Dict[str, Any]:
+    """The same trivial endpoint behind no middleware, the old @app.middleware("http") check and the ASGI check"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    def build() -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        return app
+
+    http_app = build()
+
+    @http_app.middleware("http")
+    async def verify_secret_header(request: Request, call_next):
+        if request.method == "OPTIONS":
+            return await call_next(request)
+        if request.headers.get("x-app-secret") != BENCH_SECRET:
+            return JSONResponse({"detail": "Forbidden"}, status_code=403)
+        return await call_next(request)
+
+    asgi_app = build()
+    asgi_app.add_middleware(SecretHeaderMiddleware, secret=BENCH_SECRET)
+    return {"none": build(), "http": http_app, "asgi": asgi_app}
+
+
+async def call_asgi(app, secret: Optional[str], requests: int) -> None:
+    """Send `requests` GET /ping requests straight to the ASGI app (no server or network)"""
+    headers = [(b"host", b"bench")]
+    if secret is not None:
+        headers.append((b"x-app-secret", secret.encode()))
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": "/ping",
+        "raw_path": b"/ping", "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def send(message):
+        pass
+
+    for _ in range(requests):
+        body_sent = False
+
+        async def receive():
+            # Like a server: the (empty) body once, then block until the client goes away
+            nonlocal body_sent
+            if body_sent:
+                await asyncio.Event().wait()
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        await app(dict(scope), receive, send)
+
+
+def table_count(SessionFactory, model) -> int:
+    db = SessionFactory()
+    try:
+        return db.query(model).count()
+    finally:
+        db.close()
+
+
+def run_benchmarks(args, SessionFactory) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def record(name: str, result: Dict[str, Any]):
+        results[name] = result
+        if "error" in result:
+            print(f"{name:<40} {result['error']}")
+        else:
+            print(f"{name:<40} median {result['median_ms']:>10.3f} ms   min {result['min_ms']:>10.3f} ms")
+
+    if "validation" in args.only:
+        for shape in args.shapes:
+            for size in args.sizes:
+                payload = make_payload(shape, size)
+                record(
+                    f"validation[{shape}-{size}]",
+                    measure(lambda: N8NMindMapResponse(**payload), args.repeat),
+                )
+                record(
+                    f"parse_payload[{shape}-{size}]",
+                    measure(lambda: parse_n8n_payload(payload, UNBOUNDED_LIMITS), args.repeat),
+                )
+
+    if "ingest" in args.only:
+        for shape in args.shapes:
+            for size in args.sizes:
+                # Parsed with the limits /generate applies before storing; the parse itself is timed under "validation"
+                try:
+                    parsed = parse_n8n_payload(make_payload(shape, size))
+                except N8NPayloadError as e:
+                    record(f"ingest[{shape}-{size}]", {"error": f"Rejected: {e}"})
+                    continue
+                db = SessionFactory()
+                try:
+                    record(
+                        f"ingest[{shape}-{size}]",
+                        measure(lambda: create_mindmap_from_payload(db, parsed, "bench-ingest"), args.repeat),
+                    )
+                finally:
+                    db.close()
+
+    if "from_orm" in args.only:
+        for size in args.sizes:
+            db = SessionFactory()
+            try:
+                mindmap_id = create_mindmap_from_payload(
+                    db, parse_n8n_payload(make_payload("balanced", size), UNBOUNDED_LIMITS), "bench-orm"
+                ).id
+
+                def serialize():
+                    # Expire so every run pays for loading the tree, as a fresh request would
+                    db.expire_all()
+                    MindMapResponse.from_orm(load_mindmap_tree(db, get_mindmap(db, mindmap_id)))
+
+                record(f"from_orm[balanced-{size}]", measure(serialize, args.repeat))
+            finally:
+                db.close()
+
+    if "analytics" in args.only or "listing" in args.only:
+        for table_size in args.table_sizes:
+            missing = table_size - table_count(SessionFactory, MindMap)
+            if missing > 0:
+                seed_mindmaps(SessionFactory, missing, args.nodes_per_map, args.sessions)
+
+            db = SessionFactory()
+            try:
+                if "analytics" in args.only:
+                    record(
+                        f"analytics[{table_size}]",
+                        measure(lambda: (db.expire_all(), get_mindmap_analytics(db)), args.repeat),
+                    )
+
+                if "listing" in args.only:
+                    # Same queries as the listing endpoints: the page, then one grouped node count
+                    def list_page(mindmaps):
+                        node_counts = get_node_counts(db, [m.id for m in mindmaps])
+                        return [node_counts.get(m.id, 0) for m in mindmaps]
+
+                    def list_recent():
+                        db.expire_all()
+                        return list_page(get_recent_mindmaps(db, 0, 20))
+
+                    def list_session():
+                        db.expire_all()
+                        return list_page(get_mindmaps_by_session(db, "bench-session-0", 0, 20))
+
+                    record(f"listing_recent[{table_size}]", measure(list_recent, args.repeat))
+                    record(f"listing_session[{table_size}]", measure(list_session, args.repeat))
+            finally:
+                db.close()
+
+    if "middleware" in args.only:
+        # Cost of the secret check layer; each timing is one batch of `requests` requests
+        loop = asyncio.new_event_loop()
+        requests = 1000
+        try:
+            for name, app in middleware_apps().items():
+                cases = [("authorized", BENCH_SECRET)] if name == "none" else [
+                    ("authorized", BENCH_SECRET), ("forbidden", None)
+                ]
+                for case, secret in cases:
+                    record(
+                        f"middleware_{name}[{case}-x{requests}]",
+                        measure(lambda: loop.run_until_complete(call_asgi(app, secret, requests)), args.repeat),
+                    )
+        finally:
+            loop.close()
+
+    return results
+
+
+def check_budget(baseline: Dict[str, Any], results: Dict[str, Dict[str, Any]], budget: float,
+                 budgets: Dict[str, float]) -> List[str]:
+    """Return a message for every benchmark whose median exceeds baseline * (1 + budget)"""
+    failures = []
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before or "median_ms" not in before:
+            continue
+        if "median_ms" not in result:
+            failures.append(f"{name}: {result.get('error')} (baseline {before['median_ms']:.3f} ms)")
+            continue
+        allowed = budgets.get(name, budget)
+        limit = before["median_ms"] * (1 + allowed)
+        if result["median_ms"] > limit:
+            failures.append(
+                f"{name}: {result['median_ms']:.3f} ms > {limit:.3f} ms "
+                f"(baseline {before['median_ms']:.3f} ms, budget {allowed:.0%})"
+            )
+    return failures
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for CRUD and schema hot paths")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--shapes", nargs="+", choices=TREE_SHAPES, default=list(TREE_SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 500], help="Tree sizes (nodes)")
+    parser.add_argument("--table-sizes", nargs="+", type=int, default=[100, 1000, 5000],
+                        help="Mind map counts for the analytics and listing benchmarks")
+    parser.add_argument("--nodes-per-map", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previously saved report to check the regression budget against")
+    parser.add_argument("--budget", type=float, default=0.25,
+                        help="Allowed median slowdown as a fraction of the baseline (0.25 = 25%%)")
+    parser.add_argument("--budget-file", help="JSON object of per-benchmark budgets overriding --budget")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="mindmap-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+                           connect_args={"check_same_thread": False})
+    try:
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        results = run_benchmarks(args, SessionFactory)
+    finally:
+        engine.dispose()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        budgets = {}
+        if args.budget_file:
+            with open(args.budget_file) as f:
+                budgets = json.load(f)
+        failures = check_budget(baseline, results, args.budget, budgets)
+        if failures:
+            print("\nRegression budget exceeded:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"\nAll benchmarks within budget of {baseline.get('commit') or 'baseline'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the n8n mind map webhook, used by the load tests and benchmarks.
+
+Latency, error rate and the size/shape of the returned tree are configurable on the
+command line and can be changed while running with PUT /__config.
+
+    python fake_n8n.py --port 5679 --latency-ms 200 --error-rate 0.05 --shape balanced --size 40
+"""
+
+import argparse
+import asyncio
+import random
+from typing import Any, Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+TREE_SHAPES = ("wide", "deep", "balanced")
+
+DEFAULT_CONFIG = {
+    "latency_ms": 50.0,    # mean response delay
+    "jitter_ms": 10.0,     # +/- uniform jitter around the mean
+    "error_rate": 0.0,     # fraction of requests answered with a 500
+    "shape": "balanced",   # wide | deep | balanced
+    "size": 30,            # total number of nodes in the tree
+    "branching": 3,        # children per node for the balanced shape
+}
+
+
+def build_tree(shape: str = "balanced", size: int = 30, branching: int = 3) -> List[Dict[str, Any]]:
+    """
+    Build an n8n style node tree with `size` nodes numbered 1..size.
+
+    wide:     every node is a root node
+    deep:     a single chain, each node the only child of the previous one
+    balanced: breadth-first tree where every node has up to `branching` children
+    """
+    if shape not in TREE_SHAPES:
+        raise ValueError(f"Unknown tree shape: {shape}")
+
+    nodes = [{"id": i, "title": f"Node {i}", "children": []} for i in range(1, size + 1)]
+    if not nodes:
+        return []
+
+    if shape == "wide":
+        return nodes
+
+    if shape == "deep":
+        for parent, child in zip(nodes, nodes[1:]):
+            parent["children"].append(child)
+        return nodes[:1]
+
+    # Balanced: node i (0-based, after the roots) hangs under node (i - branching) // branching
+    roots = nodes[:branching]
+    for index in range(branching, size):
+        nodes[(index - branching) // branching]["children"].append(nodes[index])
+    return roots
+
+
+def build_response(idea: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "idea": idea,
+        "nodes": build_tree(config["shape"], int(config["size"]), int(config["branching"])),
+    }
+
+
+def create_app(**overrides) -> Starlette:
+    config = dict(DEFAULT_CONFIG, **overrides)
+    stats = {"requests": 0, "errors": 0}
+
+    async def mindmap(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if random.random() < config["error_rate"]:
+            stats["errors"] += 1
+            return JSONResponse({"message": "Workflow execution failed"}, status_code=500)
+
+        return JSONResponse(build_response(body.get("idea", ""), config))
+
+    async def get_config(request: Request):
+        return JSONResponse({"config": config, "stats": stats})
+
+    async def update_config(request: Request):
+        updates = await request.json()
+        unknown = set(updates) - set(DEFAULT_CONFIG)
+        if unknown:
+            return JSONResponse({"detail": f"Unknown config keys: {sorted(unknown)}"}, status_code=400)
+        config.update(updates)
+        return JSONResponse({"config": config, "stats": stats})
+
+    return Starlette(routes=[
+        Route("/webhook-test/mindmap", mindmap, methods=["POST"]),
+        Route("/webhook/mindmap", mindmap, methods=["POST"]),
+        Route("/__config", get_config, methods=["GET"]),
+        Route("/__config", update_config, methods=["PUT"]),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake n8n mind map webhook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5679)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_CONFIG["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    parser.add_argument("--shape", choices=TREE_SHAPES, default=DEFAULT_CONFIG["shape"])
+    parser.add_argument("--size", type=int, default=DEFAULT_CONFIG["size"])
+    parser.add_argument("--branching", type=int, default=DEFAULT_CONFIG["branching"])
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        shape=args.shape,
+        size=args.size,
+        branching=args.branching,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
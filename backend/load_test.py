@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Reproducible load test for the Mind Map API.
+
+Starts the fake n8n webhook (fake_n8n.py) and the backend as subprocesses on free
+ports, pointing the backend at a throw-away SQLite file. Then runs the generate,
+read, listing and analytics scenarios at each concurrency level and writes
+throughput and latency percentiles as JSON so runs can be compared between commits.
+
+    python load_test.py --concurrency 1 8 32 --requests 200 --output load.json
+    python load_test.py --compare load.json          # run again and diff against a saved report
+
+The batch scenario sends --batch-size ideas to /mindmaps/generate/batch, using each
+concurrency level as the batch's n8n concurrency, and reports ideas per second.
+The outage scenario switches the fake webhook to fail every call while generating,
+to check that retries stay bounded and the circuit breaker answers with fast 503s.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SECRET_KEY = "secret-key-not-expose-backend-outside-app"
+HEADERS = {"x-app-secret": SECRET_KEY, "Content-Type": "application/json"}
+
+SCENARIOS = ("generate", "read", "listing", "analytics", "batch", "outage")
+
+IDEA_WORDS = [
+    "AI-powered", "sustainable", "subscription", "marketplace", "platform", "delivery",
+    "fitness", "education", "healthcare", "blockchain", "logistics", "analytics",
+]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = 20.0, headers: Optional[Dict[str, str]] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, headers=headers, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Service at {url} did not become ready within {timeout}s")
+
+
+@contextmanager
+def running_services(args):
+    """Start fake n8n and the backend, yield their base URLs, and clean both up"""
+    n8n_port = free_port()
+    backend_port = free_port()
+    processes = []
+
+    with tempfile.TemporaryDirectory(prefix="mindmap-load-") as tmp_dir:
+        try:
+            processes.append(subprocess.Popen(
+                [
+                    sys.executable, os.path.join(BACKEND_DIR, "fake_n8n.py"),
+                    "--port", str(n8n_port),
+                    "--latency-ms", str(args.n8n_latency_ms),
+                    "--jitter-ms", str(args.n8n_jitter_ms),
+                    "--error-rate", str(args.n8n_error_rate),
+                    "--shape", args.shape,
+                    "--size", str(args.size),
+                    "--branching", str(args.branching),
+                ],
+                cwd=BACKEND_DIR,
+            ))
+            wait_until_ready(f"http://127.0.0.1:{n8n_port}/__config")
+
+            env = dict(os.environ)
+            env.update(
+                DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'load_test.db')}",
+                N8N_WEBHOOK_URL=f"http://127.0.0.1:{n8n_port}/webhook-test/mindmap",
+            )
+            processes.append(subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "app.app:app",
+                    "--host", "127.0.0.1", "--port", str(backend_port),
+                    "--log-level", "warning",
+                ],
+                cwd=BACKEND_DIR,
+                env=env,
+            ))
+            base_url = f"http://127.0.0.1:{backend_port}"
+            wait_until_ready(f"{base_url}/mindmaps/health", headers=HEADERS)
+
+            yield base_url, f"http://127.0.0.1:{n8n_port}"
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    concurrency: int,
+    total_requests: int,
+    make_request: Callable[[httpx.AsyncClient, int], Any],
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    status_counts: Dict[str, int] = {}
+    counter = iter(range(total_requests))
+
+    async def worker():
+        for index in counter:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in status_counts.items() if not status.startswith("2"))
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "status_counts": status_counts,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total_requests / duration, 2) if duration > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def random_idea(rng: random.Random) -> str:
+    return " ".join(rng.sample(IDEA_WORDS, 4))
+
+
+async def run_load_test(base_url: str, args, n8n_url: Optional[str] = None) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    sessions = [f"load-session-{i}" for i in range(args.sessions)]
+    mindmap_ids: List[int] = []
+    results = []
+
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, headers=HEADERS, timeout=args.timeout, limits=limits) as client:
+
+        async def generate(client, index):
+            response = await client.post("/mindmaps/generate", json={
+                "idea": random_idea(rng),
+                "session_id": sessions[index % len(sessions)],
+            })
+            if response.status_code == 200:
+                mindmap_ids.append(response.json()["id"])
+            return response
+
+        async def read(client, index):
+            return await client.get(f"/mindmaps/mindmap/{rng.choice(mindmap_ids)}")
+
+        async def listing(client, index):
+            if index % 2:
+                return await client.get("/mindmaps/recent", params={"limit": 20})
+            return await client.get(f"/mindmaps/session/{rng.choice(sessions)}/mindmaps", params={"limit": 20})
+
+        async def analytics(client, index):
+            return await client.get("/mindmaps/analytics")
+
+        async def batch(client, index, concurrency):
+            response = await client.post("/mindmaps/generate/batch", json={
+                "items": [
+                    {"idea": random_idea(rng), "session_id": sessions[item % len(sessions)]}
+                    for item in range(args.batch_size)
+                ],
+                "concurrency": concurrency,
+            })
+            if response.status_code == 200:
+                mindmap_ids.extend(
+                    result["mindmap_id"] for result in response.json()["results"] if result["mindmap_id"]
+                )
+            return response
+
+        scenario_requests = {
+            "generate": generate, "read": read, "listing": listing, "analytics": analytics,
+            # Generate while the fake n8n fails every call: measures retries and circuit breaker fail-fast
+            "outage": generate,
+        }
+
+        for name in args.scenarios:
+            if name == "outage":
+                if not n8n_url:
+                    print("Skipping outage scenario: needs the fake n8n started by this script")
+                    continue
+                await client.put(f"{n8n_url}/__config", json={"error_rate": 1.0})
+            for concurrency in args.concurrency:
+                if name == "read" and not mindmap_ids:
+                    print("Skipping read scenario: no mind maps were generated")
+                    break
+                if name == "batch":
+                    # One client request at a time; the concurrency level is applied to the n8n calls
+                    result = await run_scenario(
+                        client, name, 1, args.batch_requests,
+                        lambda client, index: batch(client, index, concurrency)
+                    )
+                    result["concurrency"] = concurrency
+                    result["batch_size"] = args.batch_size
+                    result["items_per_s"] = round(result["throughput_rps"] * args.batch_size, 2)
+                else:
+                    result = await run_scenario(client, name, concurrency, args.requests, scenario_requests[name])
+                results.append(result)
+                print(
+                    f"{name:<10} c={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  "
+                    f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms  "
+                    f"errors={result['errors']}"
+                )
+            if name == "outage":
+                await client.put(f"{n8n_url}/__config", json={"error_rate": args.n8n_error_rate})
+
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]):
+    """Print throughput and p95 changes for every scenario/concurrency pair present in both reports"""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nComparison against {baseline.get('commit') or 'baseline'}:")
+    for result in current["results"]:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if not before:
+            continue
+        rps_change = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0.0
+        p95_change = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        print(
+            f"{result['scenario']:<10} c={result['concurrency']:<4} "
+            f"throughput {rps_change:+6.1f}%  p95 {p95_change:+6.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Mind Map API against a fake n8n webhook")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=500, help="Ideas per request in the batch scenario")
+    parser.add_argument("--batch-requests", type=int, default=1, help="Batch requests per concurrency level")
+    parser.add_argument("--sessions", type=int, default=200,
+                        help="Number of distinct session ids to spread load over (the default keeps each "
+                             "session within the default per-session rate limit)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--n8n-latency-ms", type=float, default=50.0)
+    parser.add_argument("--n8n-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--n8n-error-rate", type=float, default=0.0)
+    parser.add_argument("--shape", choices=("wide", "deep", "balanced"), default="balanced")
+    parser.add_argument("--size", type=int, default=30, help="Nodes per generated mind map")
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--base-url", help="Use an already running backend instead of starting one")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Compare against a previously saved JSON report")
+    args = parser.parse_args()
+
+    if args.base_url:
+        results = asyncio.run(run_load_test(args.base_url, args))
+    else:
+        with running_services(args) as (base_url, n8n_url):
+            results = asyncio.run(run_load_test(base_url, args, n8n_url))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare", "base_url")
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
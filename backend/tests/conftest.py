@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+import tempfile
+
+# The engine is created when app.models is imported, so the test database has to be set first
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="mindmap-tests-"), "test.db")
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController
+from app.api import mindmaps
+from app.app import app
+from app.config.config import SECRET_KEY
+from app.n8n_client import N8NCallPolicy
+from fake_n8n import build_tree
+
+HEADERS = {"x-app-secret": SECRET_KEY}
+
+
+class FakeN8N:
+    """In-process n8n webhook for N8NCallPolicy: fixed latency and tree size, records concurrency"""
+
+    def __init__(self, size: int = 30, latency: float = 0.0, status_code: int = 200):
+        self.size = size
+        self.latency = latency
+        self.status_code = status_code
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, text="fake n8n failure")
+        idea = json.loads(request.content)["idea"]
+        return httpx.Response(200, json={"idea": idea, "nodes": build_tree("balanced", self.size)})
+
+
+@pytest.fixture
+def client():
+    client = TestClient(app)
+    client.headers.update(HEADERS)
+    return client
+
+
+@pytest.fixture
+def fake_n8n(monkeypatch):
+    """Point the generate endpoints at a FakeN8N with fresh breaker and admission state (default limits)"""
+    fake = FakeN8N()
+    monkeypatch.setattr(mindmaps, "n8n_policy", N8NCallPolicy(url="http://fake-n8n/webhook/mindmap",
+                                                              transport=httpx.MockTransport(fake)))
+    monkeypatch.setattr(mindmaps, "generate_admission", AdmissionController())
+    return fake
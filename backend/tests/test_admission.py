@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+
+
+def controller(**kwargs) -> AdmissionController:
+    # A rate this low never refills during a test, so token counts are exact
+    options = dict(max_concurrent=1, max_queue=10, max_wait=10, rate_per_minute=0.001, burst=2)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+async def hold_slot(admission: AdmissionController, release: asyncio.Event):
+    async with admission.admit("holder"):
+        await release.wait()
+
+
+def run_while_busy(admission: AdmissionController, attempt):
+    """Run `attempt` while another request holds the only slot"""
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold_slot(admission, release))
+        await asyncio.sleep(0)
+        try:
+            return await attempt()
+        finally:
+            release.set()
+            await holder
+    return asyncio.run(scenario())
+
+
+async def admit_once(admission: AdmissionController, key: str = "session"):
+    async with admission.admit(key):
+        pass
+
+
+def test_rate_limit_rejects_with_429():
+    admission = controller()
+    asyncio.run(admit_once(admission))
+    asyncio.run(admit_once(admission))
+    with pytest.raises(AdmissionRejected) as error:
+        asyncio.run(admit_once(admission))
+    assert error.value.status_code == 429
+    assert error.value.retry_after > 0
+    assert admission.counters["rejected_rate_limited"] == 1
+
+
+def test_queue_full_refunds_the_token():
+    admission = controller(max_queue=0)
+    with pytest.raises(AdmissionRejected) as error:
+        run_while_busy(admission, lambda: admit_once(admission))
+    assert error.value.status_code == 503
+    assert admission.counters["rejected_queue_full"] == 1
+    assert admission.buckets["session"].tokens == pytest.approx(2, abs=0.01)
+
+
+def test_wait_estimate_refunds_the_token():
+    admission = controller(max_wait=1)
+    admission.avg_service_time = 5
+    with pytest.raises(AdmissionRejected):
+        run_while_busy(admission, lambda: admit_once(admission))
+    assert admission.counters["rejected_wait_estimate"] == 1
+    assert admission.buckets["session"].tokens == pytest.approx(2, abs=0.01)
+
+
+def test_queue_timeout_refunds_the_token():
+    admission = controller(max_wait=0.05)
+    admission.avg_service_time = 0
+    with pytest.raises(AdmissionRejected):
+        run_while_busy(admission, lambda: admit_once(admission))
+    assert admission.counters["rejected_wait_timeout"] == 1
+    assert admission.buckets["session"].tokens == pytest.approx(2, abs=0.01)
+
+
+def test_slot_without_bucket_only_limits_concurrency():
+    admission = controller(max_concurrent=2)
+    running = []
+
+    async def call():
+        async with admission.slot():
+            running.append(admission.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert max(running) == 2
+    assert admission.counters["admitted"] == 6
+    assert not admission.buckets
@@ -0,0 +1,41 @@
+import time
+
+from app.config.config import N8N_BATCH_CONCURRENCY, SESSION_BURST
+
+LATENCY = 0.05
+
+
+def test_500_idea_batch_completes_at_n8n_concurrency(client, fake_n8n):
+    """The motivating batch: default admission limits, one session, every idea stored"""
+    fake_n8n.latency = LATENCY
+    items = [{"idea": f"Batch idea {index}", "session_id": "batch-500"} for index in range(500)]
+
+    started = time.perf_counter()
+    response = client.post("/mindmaps/generate/batch", json={"items": items})
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 500, [r for r in body["results"] if r["status"] != "created"][:3]
+    assert all(result["mindmap_id"] for result in body["results"])
+    assert fake_n8n.calls == 500
+    assert fake_n8n.max_in_flight == N8N_BATCH_CONCURRENCY
+
+    # Throughput follows the n8n concurrency: 500 calls in waves of N8N_BATCH_CONCURRENCY
+    ideal = 500 / N8N_BATCH_CONCURRENCY * LATENCY
+    assert elapsed < ideal * 2, f"500 ideas took {elapsed:.2f}s, ideal {ideal:.2f}s"
+
+
+def test_batch_costs_one_rate_limit_token(client, fake_n8n):
+    # Each batch is larger than the burst, yet the burst admits that many whole batches
+    size = SESSION_BURST + 1
+    for batch in range(SESSION_BURST):
+        items = [{"idea": f"Token {batch}-{index}"} for index in range(size)]
+        response = client.post("/mindmaps/generate/batch", json={"items": items})
+        assert response.status_code == 200
+        assert response.json()["succeeded"] == size
+    assert fake_n8n.calls == size * SESSION_BURST
+
+    response = client.post("/mindmaps/generate/batch", json={"items": [{"idea": "One too many"}]})
+    assert response.status_code == 429
+    assert fake_n8n.calls == size * SESSION_BURST
@@ -0,0 +1,61 @@
+import gzip
+
+from app import cache
+from app.cache import ResponseCache
+
+
+def test_put_after_invalidation_is_dropped():
+    responses = ResponseCache(max_bytes=10_000)
+    generation = responses.generation()
+    responses.invalidate_groups([1])
+
+    responses.put(1, b'{"id": 1}', generation)
+    assert responses.get(1) is None
+
+    responses.put(1, b'{"id": 1}', responses.generation())
+    assert responses.get(1) is not None
+
+
+def test_invalidation_of_other_groups_does_not_drop_put():
+    responses = ResponseCache(max_bytes=10_000)
+    generation = responses.generation()
+    responses.invalidate_groups([2])
+    responses.put(1, b'{"id": 1}', generation)
+    assert responses.get(1) is not None
+
+
+def test_invalidate_groups_drops_every_key_of_the_group():
+    responses = ResponseCache(max_bytes=10_000, group=lambda key: key[0])
+    responses.put((1, "tree"), b"{}")
+    responses.put((1, "radial"), b"{}")
+    responses.put((2, "tree"), b"{}")
+
+    responses.invalidate_groups([1])
+    assert responses.get((1, "tree")) is None
+    assert responses.get((1, "radial")) is None
+    assert responses.get((2, "tree")) is not None
+    assert responses.bytes == responses.entries[(2, "tree")].size
+
+
+def test_forgotten_tombstones_still_block_older_reads(monkeypatch):
+    monkeypatch.setattr(cache, "MAX_TOMBSTONES", 2)
+    responses = ResponseCache(max_bytes=10_000)
+    generation = responses.generation()
+    responses.invalidate_groups([1])
+    responses.invalidate_groups([2])
+    responses.invalidate_groups([3])
+    assert 1 not in responses.tombstones
+
+    # Group 1's tombstone is gone, so any read older than it is treated as stale
+    responses.put(1, b'{"id": 1}', generation)
+    assert responses.get(1) is None
+    responses.put(1, b'{"id": 1}', responses.generation())
+    assert responses.get(1) is not None
+
+
+def test_large_bodies_are_compressed():
+    responses = ResponseCache(max_bytes=100_000, compress_min_bytes=100)
+    body = b'{"nodes": "' + b"x" * 1000 + b'"}'
+    entry = responses.put(1, body)
+    assert entry.compressed
+    assert gzip.decompress(entry.body) == body
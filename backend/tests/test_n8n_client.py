@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.n8n_client import CircuitBreaker, CircuitOpenError, N8NCallPolicy, N8NStatusError
+from tests.conftest import FakeN8N
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 1
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert 0 < error.value.retry_after <= 30
+
+
+def test_breaker_half_open_admits_one_trial(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_breaker_failed_trial_reopens(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10)
+    for _ in range(5):
+        breaker.record_failure()
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_trial_without_verdict_is_released(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    breaker.before_call()
+    breaker.release_trial()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_policy_fails_fast_once_the_breaker_is_open():
+    fake = FakeN8N(status_code=503)
+    policy = N8NCallPolicy(
+        url="http://fake-n8n/webhook/mindmap", max_attempts=2, backoff_base=0, backoff_max=0,
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30), transport=httpx.MockTransport(fake),
+    )
+
+    with pytest.raises(N8NStatusError):
+        asyncio.run(policy.call("Outage"))
+    assert fake.calls == 2
+    assert policy.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call("Outage"))
+    assert fake.calls == 2
+    assert policy.stats["rejected"] == 1
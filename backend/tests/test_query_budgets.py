@@ -0,0 +1,44 @@
+"""Query budgets for the read and generate paths; a lazy load per row or node breaks them"""
+from app.api import mindmaps
+from app.instrumentation import assert_max_queries
+
+
+def generate(client, idea, session_id=None):
+    response = client.post("/mindmaps/generate", json={"idea": idea, "session_id": session_id})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_generate_query_count_does_not_grow_with_nodes(client, fake_n8n):
+    fake_n8n.size = 300
+    with assert_max_queries(12):
+        body = generate(client, "Budget generate")
+    assert len(body["nodes"]) == 300
+
+
+def test_get_mindmap_query_count(client, fake_n8n):
+    fake_n8n.size = 300
+    mindmap_id = generate(client, "Budget read")["id"]
+    mindmaps.invalidate_mindmap_caches([mindmap_id])
+
+    with assert_max_queries(3):
+        response = client.get(f"/mindmaps/mindmap/{mindmap_id}")
+    assert response.status_code == 200
+    assert len(response.json()["nodes"]) == 300
+
+    # Served from mindmap_cache
+    with assert_max_queries(0):
+        assert client.get(f"/mindmaps/mindmap/{mindmap_id}").status_code == 200
+
+
+def test_listing_query_counts(client, fake_n8n):
+    items = [{"idea": f"Budget listing {index}", "session_id": "budget-listing"} for index in range(20)]
+    assert client.post("/mindmaps/generate/batch", json={"items": items}).json()["succeeded"] == 20
+
+    with assert_max_queries(2):
+        response = client.get("/mindmaps/session/budget-listing/mindmaps", params={"limit": 20})
+    assert [item["node_count"] for item in response.json()] == [30] * 20
+
+    with assert_max_queries(2):
+        response = client.get("/mindmaps/recent", params={"limit": 20})
+    assert len(response.json()) == 20